@@ -0,0 +1,250 @@
+# standard modules
+import sys
+import time
+import base64
+import base58
+import json
+import hashlib
+import tracemalloc
+# my modules
+from Block import Block
+from PoW import PoW
+from MerkleTree import MerkleTree
+from Wallet import Wallet
+from Verifier import verify_batch
+from Signature import SCHEMES, DEFAULT_SCHEME, LEGACY_SCHEME, get_scheme
+
+
+def bench_pow(bits_list=(8, 12, 16), rounds=5):
+    """Measure the hashrate of PoW.run at several bits
+
+    PoW.run tries the nonces in order and stops at the first valid one, so the number of hashes
+    it computed for a block is the valid nonce plus one.
+
+    Parameters:
+    ----------
+    bits_list : List[int]
+        the hardness values to be measured
+
+    rounds : int
+        the number of blocks mined for each setting
+    """
+    prev_hash = base64.b64encode(hashlib.sha256().digest()).decode()
+    print(f'{"bits":>4} {"hashes":>10} {"seconds":>10} {"hashrate":>12}')
+
+    for bits in bits_list:
+        # Different times give different blocks, each with its own valid nonce
+        blocks = [Block(-1, float(i), bits, 0, [f'benchmark transaction {i}'], prev_hash)
+                  for i in range(rounds)]
+
+        hashed = 0
+        start = time.perf_counter()
+        for block in blocks:
+            nonce, hash = PoW(block).run()
+            hashed += nonce + 1
+        elapsed = time.perf_counter() - start
+
+        print(f'{bits:>4} {hashed:>10} {elapsed:>10.3f} {hashed / elapsed:>12.0f}')
+
+
+class _Node:
+    """A node of the object-per-node merkle tree, kept as the baseline of bench_merkle"""
+
+    def __init__(self, left=None, right=None, data=None):
+        self._left = left
+        self._right = right
+        self._data = data
+
+
+def _node_merkle_tree(arr):
+    """Build the merkle tree with one object per node, the way it used to be built
+
+    Parameters:
+    ----------
+    arr : List[str]
+        a list of transactions strings
+
+    Returns:
+    ----------
+    root : _Node
+        the root node, its data is the base64 encoded top hash
+    """
+    nodes = [_Node(None, None, tx) for tx in arr]
+    if len(nodes) % 2 != 0:
+        nodes.append(nodes[-1])
+
+    while len(nodes) > 1:
+        if len(nodes) % 2 != 0:
+            nodes.append(nodes[-1])
+
+        new_level = []
+        for j in range(0, len(nodes), 2):
+            m = hashlib.sha256()
+            m.update(nodes[j]._data.encode())
+            m.update(nodes[j + 1]._data.encode())
+            new_level.append(
+                _Node(nodes[j], nodes[j + 1], base64.b64encode(m.digest()).decode()))
+
+        nodes = new_level
+
+    return nodes[0]
+
+
+def bench_merkle(sizes=(1000, 10000, 50000), rounds=3):
+    """Compare the build time and memory of the array merkle tree with the object-per-node tree
+
+    The memory is what the built tree keeps alive, measured with tracemalloc, not counting
+    the transaction strings themselves.
+
+    Parameters:
+    ----------
+    sizes : List[int]
+        the numbers of transactions to be measured
+
+    rounds : int
+        the number of builds for each size, the best time is reported
+    """
+    print(f'{"size":>6} {"engine":>8} {"seconds":>10} {"memory":>12}')
+
+    for size in sizes:
+        txs = [f'from: sender {i} -- to: receiver {i} -- amount: {i}|signature{i:080d}'
+               for i in range(size)]
+
+        engines = [('nodes', lambda: _node_merkle_tree(txs)),
+                   ('array', lambda: MerkleTree.new_merkle_tree(txs))]
+
+        for name, build in engines:
+            # Best of several rounds for the time
+            best = None
+            for _ in range(rounds):
+                start = time.perf_counter()
+                build()
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            # Memory kept alive by a tree
+            tracemalloc.start()
+            tree = build()
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del tree
+
+            print(f'{size:>6} {name:>8} {best:>10.4f} {memory:>12}')
+
+
+def _generating_deserialize(raw_data):
+    """Load a wallet by generating a new one and overwriting its keys, kept as the baseline of bench_wallet_load"""
+    data = json.loads(raw_data)
+    scheme = get_scheme(data.get('scheme', LEGACY_SCHEME))
+
+    wallet = Wallet(data['name'], data['balance'], scheme=scheme.name)
+    wallet.sk = scheme.signing_key(base64.b64decode(data['sk'].encode()))
+    wallet.vk = scheme.verifying_key(base64.b64decode(data['vk'].encode()))
+    wallet.address = data['address']
+
+    return wallet
+
+
+def bench_wallet_load(counts=(10, 100, 500)):
+    """Compare the load time of a wallet file with and without the key generation per wallet
+
+    Parameters:
+    ----------
+    counts : List[int]
+        the numbers of wallets in the file
+    """
+    print(f'{"wallets":>7} {"loader":>10} {"seconds":>10} {"per wallet":>12}')
+
+    for count in counts:
+        lines = [Wallet.serialize(Wallet(f'user {i}', i))
+                 for i in range(count)]
+
+        for name, load in [('generate', _generating_deserialize), ('stored', Wallet.deserialize)]:
+            start = time.perf_counter()
+            for line in lines:
+                load(line)
+            elapsed = time.perf_counter() - start
+
+            print(f'{count:>7} {name:>10} {elapsed:>10.3f} {elapsed / count * 1000:>10.2f}ms')
+
+
+def bench_verify(count=512, workers_list=(1, 2, 4), scheme=DEFAULT_SCHEME):
+    """Compare the serial and the process pool signature verification of a batch
+
+    Parameters:
+    ----------
+    count : int
+        the number of signatures in the batch
+
+    workers_list : List[int]
+        the numbers of worker processes to be measured
+
+    scheme : str
+        the id of the signature scheme
+    """
+    scheme = get_scheme(scheme)
+
+    # A few signers like the accounts of a small chain
+    signers = [scheme.generate() for _ in range(8)]
+    items = []
+    for i in range(count):
+        sk = signers[i % len(signers)]
+        message = f'benchmark transaction {i}'.encode()
+        items.append((sk.verifying_key.to_string(), message, sk.sign(message)))
+
+    print(f'{"workers":>7} {"seconds":>10} {"signatures/s":>14}')
+
+    for workers in workers_list:
+        start = time.perf_counter()
+        results = verify_batch(items, scheme, workers)
+        elapsed = time.perf_counter() - start
+
+        assert all(results)
+        print(f'{workers:>7} {elapsed:>10.3f} {count / elapsed:>14.0f}')
+
+
+def bench_signature(count=200):
+    """Compare the sign and verify throughput and the size on disk of each signature scheme
+
+    Parameters:
+    ----------
+    count : int
+        the number of records signed and verified per scheme
+    """
+    print(f'{"scheme":>16} {"sign/s":>8} {"verify/s":>9} {"signature":>10} {"record":>7} {"wallet":>7}')
+
+    for name, scheme in SCHEMES.items():
+        wallet = Wallet('benchmark', 0, scheme=name)
+        sk = wallet.signing_key
+        vk = wallet.verifying_key
+        records = [f'from: {wallet.address} -- to: {wallet.address} -- amount: {i}'.encode()
+                   for i in range(count)]
+
+        start = time.perf_counter()
+        signatures = [scheme.sign(sk, record) for record in records]
+        sign_rate = count / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        assert all(scheme.verify(vk, record, signature)
+                   for record, signature in zip(records, signatures))
+        verify_rate = count / (time.perf_counter() - start)
+
+        # The bytes a signed record and a wallet line take in the files
+        signature = base58.b58encode(signatures[0]).decode()
+        record = f'{records[0].decode()}|{signature}'
+        line = Wallet.serialize(wallet)
+
+        print(f'{name:>16} {sign_rate:>8.0f} {verify_rate:>9.0f} {len(signatures[0]):>9}B {len(record):>6}B {len(line):>6}B')
+
+
+BENCHMARKS = {'pow': bench_pow, 'merkle': bench_merkle,
+              'wallet_load': bench_wallet_load, 'verify': bench_verify,
+              'signature': bench_signature}
+
+
+if __name__ == '__main__':
+    # Run the benchmarks given on the command line, all of them by default
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f'--- {name} ---')
+        BENCHMARKS[name]()
@@ -3,13 +3,35 @@ import sys
 import os
 import hashlib
 import json
+import base58
 import base64
+import struct
 import time
 from configparser import ConfigParser
 # my modules
 from PoW import PoW
 from MerkleTree import MerkleTree
 
+# The version of the binary block encoding
+BINARY_VERSION = 1
+
+# version, flags, height, time, bits, nonce, raw prev hash, raw hash, raw merkle hash, number of transactions
+BINARY_HEADER = struct.Struct('>BBIdHQ32s32s32sI')
+
+# kind of the transaction, length of the record
+BINARY_TRANSACTION = struct.Struct('>BI')
+
+# length of the raw signature
+BINARY_SIGNATURE = struct.Struct('>H')
+
+# header flags
+NO_PREV_HASH = 1
+NO_MERKLE_HASH = 2
+
+# transaction kinds
+PLAIN_RECORD = 0
+SIGNED_RECORD = 1
+
 
 class Block:
     """
@@ -41,27 +63,45 @@ class Block:
         the hash value of this block
 
     merkle_tree : MerkleTree
-        the constructed merkle tree based on the transactions
+        the constructed merkle tree based on the transactions, built on first access for loaded blocks
+
+    merkle_hash : str
+        the base64 encoded top hash of the merkle tree, as stored for loaded blocks
 
     Methods: 
     ----------
-    set_hash() : None
+    set_hash(workers, reporter) : None
         compute the hash of the block and append this and nonce to the block attributes
 
+    mine(cursor, deadline, token, workers, reporter) : MiningResult
+        search for the hash of the block until found, the deadline passes or the token is cancelled
+
     print_block() : None
         print the block
 
+    verify_merkle() : bool
+        check the stored merkle hash against the one recomputed from the transactions
+
+    verify_hash() : bool
+        check the stored hash against the block data, the nonce and the bits
+
 
     Static Methods:
     ----------
     serialize(block: Block) : str 
         return the serialization of the block
 
-    deserialize(raw_data: str) : Block
+    deserialize(raw_data: str, verify: bool) : Block
         deserialize the raw_data can create the Block instance based on the given data
+
+    serialize_binary(block: Block) : bytes
+        return the versioned binary encoding of the block
+
+    deserialize_binary(raw_data: bytes, verify: bool) : Block
+        create the Block instance from its binary encoding
     """
 
-    def __init__(self, prev_height, time, bits, nonce, transactions, prev_hash):
+    def __init__(self, prev_height, time, bits, nonce, transactions, prev_hash, merkle_tree=None, merkle_hash=None):
         """
         Parameters:
         ----------
@@ -85,6 +125,12 @@ class Block:
 
         hash : byte
             the hash value of this block
+
+        merkle_tree : MerkleTree
+            the merkle tree already built on the transactions, built from them if not given
+
+        merkle_hash : str
+            the stored top hash of a loaded block, the tree is then only built when needed
         """
         self._height = prev_height + 1
         self._time = time
@@ -93,7 +139,12 @@ class Block:
         self._transactions = transactions
         self._prev_hash = prev_hash
         self._hash = ''
-        self._merkle_tree = self._create_merkle_tree()
+        self._merkle_tree = merkle_tree
+        self._merkle_hash = merkle_hash
+
+        # A new block needs its merkle hash for the PoW right away
+        if merkle_tree is None and merkle_hash is None:
+            self._merkle_tree = self._create_merkle_tree()
 
     def __str__(self):
         """the string representation of the block"""
@@ -107,7 +158,7 @@ class Block:
                        f"transactions: {str(self.transactions)}",
                        f"previous hash: {self.prev_hash}",
                        f"hash: {self.hash}",
-                       f'Merkle hash: {self.merkle_tree.hash}',
+                       f'Merkle hash: {self.merkle_hash}',
                        f"---\n"]
 
         info = '\n'.join(info_pieces)
@@ -155,25 +206,93 @@ class Block:
 
     @property
     def merkle_tree(self):
-        """The merkle tree of the block"""
+        """The merkle tree of the block, built on first access"""
+        if self._merkle_tree is None:
+            self._merkle_tree = self._create_merkle_tree()
         return self._merkle_tree
 
     @merkle_tree.setter
     def merkle_tree(self, merkle_tree):
         self._merkle_tree = merkle_tree
 
+    @property
+    def merkle_hash(self):
+        """The base64 encoded top hash of the merkle tree, the stored one for loaded blocks"""
+        if self._merkle_hash is not None:
+            return self._merkle_hash
+        return self.merkle_tree.hash
+
     def print_block(self):
         """Print the block"""
         print(self)
 
-    def set_hash(self):
-        """Compute the hash of the block"""
+    def set_hash(self, workers=1, reporter=None):
+        """Compute the hash of the block
+
+        Parameters:
+        ----------
+        workers : int
+            the number of processes to search the nonce, more than one to mine in parallel
+
+        reporter : Reporter
+            the sink of the mining progress, silent if not given
+        """
+        self.mine(workers=workers, reporter=reporter)
 
+    def mine(self, cursor=0, deadline=None, token=None, workers=1, reporter=None):
+        """Search for the hash of the block, the nonce and hash are set once found
+
+        Parameters:
+        ----------
+        cursor : int
+            the first nonce to try, the cursor of a previous unfinished result to resume it
+
+        deadline : float (unix timestamp)
+            the time to give up the search, search forever if it is None
+
+        token : CancelToken
+            the token to cancel the search from another thread
+
+        workers : int
+            the number of processes to search the nonce, more than one to mine in parallel
+
+        reporter : Reporter
+            the sink of the mining progress, silent if not given
+
+        Returns:
+        ----------
+        result : MiningResult
+            the found nonce and hash, or the cursor to resume the search
+        """
         # Create a PoW instance and pass self block as the argument
         Pow = PoW(self)
 
         # Run the PoW process to get the nonce and the hash value
-        self._nonce, self._hash = Pow.run()
+        result = Pow.mine(cursor, deadline, token, workers, reporter)
+        if result.found:
+            self._nonce, self._hash = result.nonce, result.hash
+
+        return result
+
+    def verify_merkle(self):
+        """Check the stored merkle hash against the one recomputed from the transactions
+
+        Returns:
+        ----------
+        result : bool
+            whether the merkle hash matches the transactions
+        """
+        return self.merkle_tree.hash == self.merkle_hash
+
+    def verify_hash(self):
+        """Check the stored hash against the one recomputed from the block data and the nonce
+
+        Returns:
+        ----------
+        result : bool
+            whether the hash commits to the block and meets its bits
+        """
+        return PoW(self).check(self.nonce, self.hash)
 
     def _create_merkle_tree(self):
         """Construct a merkle tree based on the transactions
@@ -202,7 +321,7 @@ class Block:
 
         # Create a dictionary to be dumped by the json module
         d = {'height': block.height, 'bits': block.bits, 'time': block.time, 'nonce': block.nonce,
-             'transactions': block.transactions, 'prev_hash': block.prev_hash, 'hash': block.hash, 'merkle_hash': block.merkle_tree.hash}
+             'transactions': block.transactions, 'prev_hash': block.prev_hash, 'hash': block.hash, 'merkle_hash': block.merkle_hash}
 
         # Use json module to dump data
         data = json.dumps(d)
@@ -211,19 +330,29 @@ class Block:
 
     # deserialize a block
     @staticmethod
-    def deserialize(raw_data):
+    def deserialize(raw_data, verify=False):
         """Deserialize a data string back into a Block instance
 
+        The merkle tree is not built, the block keeps the stored merkle hash until the tree
+        is needed.
+
         Parameters:
         ----------
         raw_data : str 
             the json formatted string data to be deserialized
 
+        verify : bool
+            build the merkle tree now and check it against the stored merkle hash
+
         Returns: 
         ----------
         block : Block
             the deserialized Block instance
 
+        Raises:
+        ----------
+        ValueError
+            if verify is set and the merkle hash does not match
         """
 
         # Load data to the json module
@@ -238,8 +367,167 @@ class Block:
         prev_hash = data['prev_hash']
 
         # Create a Block instance and also set the hash value to the block
-        block = Block(height - 1, time, bits, nonce, transactions, prev_hash)
+        block = Block(height - 1, time, bits, nonce, transactions,
+                      prev_hash, merkle_hash=data['merkle_hash'])
         block.hash = data['hash']
-        block._create_merkle_tree()
+
+        if verify and not block.verify_merkle():
+            raise ValueError(
+                f'Block {height} has a merkle hash not matching its transactions!!!')
 
         return block
+
+    @staticmethod
+    def serialize_binary(block):
+        """Encode a block in the versioned binary format
+
+        The header has fixed-width fields and the raw 32-byte hashes, each transaction is
+        length-prefixed and a signed record keeps its signature as the raw base58-decoded bytes.
+
+        Parameters:
+        ----------
+        block : Block
+            the block instance to be encoded
+
+        Returns:
+        ----------
+        data : bytes
+            the binary encoding of the block
+        """
+        flags = 0
+        if not block.prev_hash:
+            flags |= NO_PREV_HASH
+        if block.merkle_hash is None:
+            flags |= NO_MERKLE_HASH
+
+        pieces = [BINARY_HEADER.pack(BINARY_VERSION, flags, block.height, block.time, block.bits, block.nonce,
+                                     _raw_hash(block.prev_hash), _raw_hash(block.hash),
+                                     _raw_hash(block.merkle_hash), len(block.transactions))]
+
+        for tx in block.transactions:
+            record, _, signature = tx.rpartition('|')
+            raw_signature = _raw_signature(signature) if record else None
+
+            # Keep the whole string if it is not a record with a base58 signature
+            if raw_signature is None:
+                data = tx.encode()
+                pieces.append(BINARY_TRANSACTION.pack(PLAIN_RECORD, len(data)))
+                pieces.append(data)
+            else:
+                data = record.encode()
+                pieces.append(BINARY_TRANSACTION.pack(SIGNED_RECORD, len(data)))
+                pieces.append(data)
+                pieces.append(BINARY_SIGNATURE.pack(len(raw_signature)))
+                pieces.append(raw_signature)
+
+        return b''.join(pieces)
+
+    @staticmethod
+    def deserialize_binary(raw_data, verify=False):
+        """Create a Block instance from its binary encoding
+
+        Parameters:
+        ----------
+        raw_data : bytes
+            the binary encoding, a memoryview is read without copying
+
+        verify : bool
+            build the merkle tree now and check it against the stored merkle hash
+
+        Returns:
+        ----------
+        block : Block
+            the decoded Block instance
+
+        Raises:
+        ----------
+        ValueError
+            if the version is unknown, or verify is set and the merkle hash does not match
+        """
+        (version, flags, height, time, bits, nonce, prev_hash, hash,
+         merkle_hash, count) = BINARY_HEADER.unpack_from(raw_data)
+
+        if version != BINARY_VERSION:
+            raise ValueError(
+                f'Block encoding version {version} is not supported!!!')
+
+        # Read the length-prefixed transactions
+        transactions = []
+        offset = BINARY_HEADER.size
+        for _ in range(count):
+            kind, length = BINARY_TRANSACTION.unpack_from(raw_data, offset)
+            offset += BINARY_TRANSACTION.size
+            tx = bytes(raw_data[offset:offset + length]).decode()
+            offset += length
+
+            if kind == SIGNED_RECORD:
+                length, = BINARY_SIGNATURE.unpack_from(raw_data, offset)
+                offset += BINARY_SIGNATURE.size
+                signature = base58.b58encode(
+                    bytes(raw_data[offset:offset + length])).decode()
+                offset += length
+                tx = tx + '|' + signature
+
+            transactions.append(tx)
+
+        prev_hash = '' if flags & NO_PREV_HASH else base64.b64encode(
+            prev_hash).decode()
+        merkle_hash = None if flags & NO_MERKLE_HASH else base64.b64encode(
+            merkle_hash).decode()
+
+        block = Block(height - 1, time, bits, nonce, transactions,
+                      prev_hash, merkle_hash=merkle_hash)
+        block.hash = base64.b64encode(hash).decode()
+
+        if verify and not block.verify_merkle():
+            raise ValueError(
+                f'Block {height} has a merkle hash not matching its transactions!!!')
+
+        return block
+
+
+def _raw_hash(hash):
+    """Decode a base64 encoded 32-byte hash, an absent hash is stored as zeros
+
+    Parameters:
+    ----------
+    hash : str
+        the base64 encoded hash, or an empty string or None
+
+    Returns:
+    ----------
+    raw : bytes
+        the raw 32-byte hash
+    """
+    if not hash:
+        return bytes(32)
+
+    raw = base64.b64decode(hash.encode())
+    if len(raw) != 32:
+        raise ValueError(f'The hash {hash} is not a 32-byte hash!!!')
+
+    return raw
+
+
+def _raw_signature(signature):
+    """Decode a base58 signature, None if the text would not be restored exactly
+
+    Parameters:
+    ----------
+    signature : str
+        the text after the last '|' of a transaction
+
+    Returns:
+    ----------
+    raw : bytes
+        the raw signature, None if it is not a base58 signature
+    """
+    try:
+        raw = base58.b58decode(signature)
+    except ValueError:
+        return None
+
+    if not signature or len(raw) > 0xffff or base58.b58encode(raw).decode() != signature:
+        return None
+
+    return raw
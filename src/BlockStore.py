@@ -0,0 +1,976 @@
+# standard modules
+import os
+import json
+import mmap
+import struct
+import base64
+import bisect
+import hashlib
+# my modules
+from Block import Block, NO_PREV_HASH, NO_MERKLE_HASH
+from Storage import StorageWriter
+
+
+class BlockStore:
+    """
+    A class for storing blocks in append-only segment files with a persistent index.
+
+    Blocks are appended to segment-N files, each segment holds at most segment_size blocks.
+    The index file has one fixed-width record per block, so the record of a height is found
+    by a single seek, and the block is then read by a single seek-and-read in its segment.
+
+    The manifest file lists the segments in height order with the first and last height and
+    the checksum of each sealed segment. It is replaced atomically when a segment rolls over,
+    and readers walk the manifest instead of listing the directory.
+
+    Each segment is written in one format, JSON lines or the binary block encoding with a
+    length prefix, recorded in its manifest entry. New segments take the format of the store
+    and convert() rewrites the segments of the other format.
+
+    Appends and manifest updates go through a StorageWriter, so the segment, index and
+    headers writes of a block are part of the batch of the operation adding it. If that
+    batch is dropped the store forgets the block, as the files never had it.
+
+    Read-only callers can map the index and segment files into memory with view(), which
+    hands out a BlockView over a slice of the mapped segment without reading the file.
+
+    The headers file keeps a fixed-width header of every block apart from the bodies, so the
+    header chain is loaded by reading a few bytes per block and header() hands out a
+    BlockHeader which reads the body only when a transaction is needed.
+
+    ...
+
+    Attributes:
+    ----------
+    path : str
+        the directory of the segment and index files
+
+    segment_size : int
+        the maximal number of blocks in a segment file
+
+    size : int
+        the number of blocks in the store
+
+    segments : List[dict]
+        the manifest entries of the segments, the last one is open for appending
+
+    format : str
+        the format of new segments, 'json' or 'binary'
+
+    Methods:
+    ----------
+    append(block) : None
+        append the block on top of the store
+
+    read(height) : Block
+        read the block at the height
+
+    get_height(hash) : int
+        get the height of the block with the hash
+
+    read_by_hash(hash) : Block
+        read the block with the hash
+
+    read_all(verify) : Iterator[Block]
+        read all blocks in height order
+
+    find_segment(height) : dict
+        get the manifest entry of the segment holding the height
+
+    view(height) : BlockView
+        get a lazily decoded view of the block at the height over the mapped segment
+
+    convert(format) : int
+        rewrite the segments in another format
+
+    header(height) : BlockHeader
+        get the header of the block at the height from the mapped headers file
+    """
+
+    # segment id, offset in the segment, length of the record, raw block hash
+    INDEX_RECORD = struct.Struct('>IQI32s')
+
+    # time, bits, nonce, raw prev hash, raw hash, raw merkle hash, flags of the absent hashes
+    HEADER_RECORD = struct.Struct('>dHQ32s32s32sB')
+
+    # length of a block in a binary segment
+    RECORD_LENGTH = struct.Struct('>I')
+
+    FORMATS = ('json', 'binary')
+
+    def __init__(self, path, segment_size=100, format=None, writer=None):
+        """
+        Parameters:
+        ----------
+        path : str
+            the directory of the segment and index files
+
+        segment_size : int
+            the maximal number of blocks in a segment file
+
+        format : str
+            the format of new segments, default to the one in the manifest or 'json'
+
+        writer : StorageWriter
+            the writer of the appends, a writer without fsync if not given
+        """
+        if format is not None and format not in self.FORMATS:
+            raise ValueError(f'The block format {format} is invalid!!!')
+
+        self._path = path
+        self._segment_size = segment_size
+        self._writer = writer if writer is not None else StorageWriter()
+        self._index_path = f'{path}/index'
+        self._manifest_path = f'{path}/manifest'
+        self._headers_path = f'{path}/headers'
+        self._hashes = None
+        self._maps = dict()
+        self._end = None
+
+        # Make sure the directory exists
+        if not os.path.exists(path):
+            os.mkdir(path)
+
+        # The number of blocks is implied by the size of the index file
+        if os.path.exists(self._index_path):
+            self._size = os.path.getsize(
+                self._index_path) // self.INDEX_RECORD.size
+        else:
+            self._size = 0
+
+        self._format = 'json'
+        self._segments = self._read_manifest()
+        if format is not None:
+            self._format = format
+
+        self._fill_headers()
+
+    @property
+    def path(self):
+        """The directory of the segment and index files"""
+        return self._path
+
+    @property
+    def segment_size(self):
+        """The maximal number of blocks in a segment file"""
+        return self._segment_size
+
+    @property
+    def size(self):
+        """The number of blocks in the store"""
+        return self._size
+
+    @property
+    def segments(self):
+        """The manifest entries of the segments"""
+        return self._segments
+
+    @property
+    def format(self):
+        """The format of new segments"""
+        return self._format
+
+    def append(self, block):
+        """Append the block on top of the store
+
+        Parameters:
+        ----------
+        block : Block
+            the block to be stored, its height must be the size of the store
+        """
+        if block.height != self._size:
+            raise ValueError(
+                f'Block {block.height} cannot be appended to a store of {self._size} blocks!!!')
+
+        self._checkpoint()
+
+        # Seal the full segment and open the next one
+        if not self._segments:
+            self._segments.append(self._new_entry(0, 0))
+            self._write_manifest()
+        elif self._size - self._segments[-1]['start'] >= self._segment_size:
+            self._roll_segment()
+
+        entry = self._segments[-1]
+        prefix, data = self._encode(block, entry.get('format', 'json'))
+        path = self._segment_path(entry['id'])
+
+        # Cut off a block, an index record or a header written without the rest of its append by a crash
+        if self._end is None:
+            self._end = self._indexed_end(entry)
+        if self._writer.size(path) > self._end:
+            self._writer.truncate(path, self._end)
+        for file, record in [(self._index_path, self.INDEX_RECORD), (self._headers_path, self.HEADER_RECORD)]:
+            if self._writer.size(file) > self._size * record.size:
+                self._writer.truncate(file, self._size * record.size)
+
+        # Append the block to its segment, the offset is the end of the segment
+        offset = self._end + len(prefix)
+        self._writer.append(path, prefix + data)
+        self._end = offset + len(data)
+
+        # Append the index record and the header of the block
+        self._writer.append(self._index_path, self.INDEX_RECORD.pack(
+            entry['id'], offset, len(data), _raw_hash(block.hash)))
+        self._writer.append(self._headers_path, self._pack_header(block))
+
+        if self._hashes is not None:
+            self._hashes[_raw_hash(block.hash)] = block.height
+        self._size += 1
+
+    def read(self, height):
+        """Read the block at the height
+
+        Parameters:
+        ----------
+        height : int
+            the height of the block
+
+        Returns:
+        ----------
+        block : Block
+            the block at the height
+        """
+        segment, offset, length, hash = self._read_record(height)
+
+        # One seek-and-read in the segment file
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+
+        return _decode(data, self._segment_format(segment))
+
+    def get_height(self, hash):
+        """Get the height of the block with the hash
+
+        Parameters:
+        ----------
+        hash : str
+            the base64 encoded hash of the block
+
+        Returns:
+        ----------
+        height : int
+            the height of the block, None if not found
+        """
+        # Build the hash lookup from the index file on first use
+        if self._hashes is None:
+            self._hashes = dict()
+            with open(self._index_path, 'rb') as f:
+                data = f.read(self._size * self.INDEX_RECORD.size)
+
+            for height, record in enumerate(self.INDEX_RECORD.iter_unpack(data)):
+                self._hashes[record[3]] = height
+
+        return self._hashes.get(_raw_hash(hash))
+
+    def read_by_hash(self, hash):
+        """Read the block with the hash
+
+        Parameters:
+        ----------
+        hash : str
+            the base64 encoded hash of the block
+
+        Returns:
+        ----------
+        block : Block
+            the block with the hash, None if not found
+        """
+        height = self.get_height(hash)
+        if height is None:
+            return None
+
+        return self.read(height)
+
+    def read_all(self, verify=False):
+        """Read all blocks in height order
+
+        Parameters:
+        ----------
+        verify : bool
+            check the checksum of each sealed segment and the merkle hash of each block
+
+        Returns:
+        ----------
+        blocks : Iterator[Block]
+            the blocks from the genesis block
+        """
+        # Read the segments in the manifest order
+        for entry in self._segments:
+            path = self._segment_path(entry['id'])
+
+            if verify and entry['checksum'] is not None and _checksum(path) != entry['checksum']:
+                raise ValueError(
+                    f'Segment {entry["id"]} does not match its checksum!!!')
+
+            yield from self._read_segment(entry, verify)
+
+    def find_segment(self, height):
+        """Get the manifest entry of the segment holding the height
+
+        Parameters:
+        ----------
+        height : int
+            the height of a block
+
+        Returns:
+        ----------
+        entry : dict
+            the id, first and last height and checksum of the segment
+        """
+        if height < 0 or height >= self._size:
+            raise IndexError(f'No block at height {height}!!!')
+
+        starts = [entry['start'] for entry in self._segments]
+        return self._segments[bisect.bisect_right(starts, height) - 1]
+
+    def view(self, height):
+        """Get a lazily decoded view of the block at the height
+
+        The index and the segment are memory-mapped once, the view only keeps a slice of the
+        mapped segment and nothing is copied or decoded until an attribute is accessed.
+
+        Parameters:
+        ----------
+        height : int
+            the height of the block
+
+        Returns:
+        ----------
+        view : BlockView
+            the view of the block at the height
+        """
+        if height < 0 or height >= self._size:
+            raise IndexError(f'No block at height {height}!!!')
+
+        # Read the index record from the mapped index
+        size = self.INDEX_RECORD.size
+        index = self._map(self._index_path, (height + 1) * size)
+        segment, offset, length, hash = self.INDEX_RECORD.unpack_from(
+            index, height * size)
+
+        data = self._map(self._segment_path(segment), offset + length)
+        return BlockView(memoryview(data)[offset:offset + length], self._segment_format(segment))
+
+    def header(self, height):
+        """Get the header of the block at the height
+
+        Parameters:
+        ----------
+        height : int
+            the height of the block
+
+        Returns:
+        ----------
+        header : BlockHeader
+            the header, its body is read from the store when needed
+        """
+        if height < 0 or height >= self._size:
+            raise IndexError(f'No block at height {height}!!!')
+
+        size = self.HEADER_RECORD.size
+        data = self._map(self._headers_path, (height + 1) * size)
+        time, bits, nonce, prev_hash, hash, merkle_hash, flags = self.HEADER_RECORD.unpack_from(
+            data, height * size)
+
+        prev_hash = '' if flags & NO_PREV_HASH else _encode_hash(prev_hash)
+        merkle_hash = None if flags & NO_MERKLE_HASH else _encode_hash(
+            merkle_hash)
+
+        return BlockHeader(height, time, bits, nonce, prev_hash, _encode_hash(hash), merkle_hash, self)
+
+    def convert(self, format):
+        """Rewrite the segments in another format
+
+        The converted segments are written under new ids next to the old ones, then the index
+        and the manifest are replaced, and the old segments are removed last. Both the index
+        and the manifest point to complete segments at any time, so an interrupted conversion
+        is simply run again.
+
+        Parameters:
+        ----------
+        format : str
+            the format to convert to, 'json' or 'binary'
+
+        Returns:
+        ----------
+        count : int
+            the number of converted blocks, 0 if every segment already has the format
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f'The block format {format} is invalid!!!')
+
+        self._format = format
+        self._writer.flush()
+        if all(entry.get('format', 'json') == format for entry in self._segments):
+            self._write_manifest()
+            return 0
+
+        # Remove the segments left by an interrupted conversion
+        known = {self._segment_path(entry['id']) for entry in self._segments}
+        for file in os.listdir(self._path):
+            path = f'{self._path}/{file}'
+            if file.startswith('segment-') and path not in known:
+                os.remove(path)
+
+        with open(self._index_path, 'rb') as f:
+            records = list(self.INDEX_RECORD.iter_unpack(
+                f.read(self._size * self.INDEX_RECORD.size)))
+
+        next_id = max(entry['id'] for entry in self._segments) + 1
+        segments = []
+        count = 0
+        for entry in self._segments:
+            if entry.get('format', 'json') == format:
+                segments.append(entry)
+                continue
+
+            # Write the blocks of the segment in the new format with their new index records
+            new_entry = self._new_entry(next_id, entry['start'])
+            with open(self._segment_path(next_id), 'wb') as f:
+                for block in self._read_segment(entry):
+                    prefix, data = self._encode(block, format)
+                    f.write(prefix)
+                    records[block.height] = (next_id, f.tell(), len(data), records[block.height][3])
+                    f.write(data)
+                    count += 1
+
+            if entry['end'] is not None:
+                new_entry['end'] = entry['end']
+                new_entry['checksum'] = _checksum(self._segment_path(next_id))
+
+            segments.append(new_entry)
+            next_id += 1
+
+        # Switch the index first, the old manifest still reads the old segments
+        with open(self._index_path + '.tmp', 'wb') as f:
+            f.write(b''.join(self.INDEX_RECORD.pack(*record) for record in records))
+        os.replace(self._index_path + '.tmp', self._index_path)
+
+        old_segments = self._segments
+        self._segments = segments
+        self._write_manifest()
+        self._maps = dict()
+
+        for entry in old_segments:
+            if entry not in segments:
+                os.remove(self._segment_path(entry['id']))
+
+        return count
+
+    def _pack_header(self, block):
+        """Pack the fixed-width header record of a block"""
+        flags = 0
+        if not block.prev_hash:
+            flags |= NO_PREV_HASH
+        if block.merkle_hash is None:
+            flags |= NO_MERKLE_HASH
+
+        return self.HEADER_RECORD.pack(block.time, block.bits, block.nonce, _raw_hash(block.prev_hash or ''),
+                                       _raw_hash(block.hash), _raw_hash(block.merkle_hash or ''), flags)
+
+    def _fill_headers(self):
+        """Write the headers missing from the headers file, for stores created without one"""
+        count = 0
+        if os.path.exists(self._headers_path):
+            count = os.path.getsize(
+                self._headers_path) // self.HEADER_RECORD.size
+
+        if count >= self._size:
+            return
+
+        # Drop a torn record, then add the headers of the blocks after the last full one
+        with open(self._headers_path, 'ab') as f:
+            f.truncate(count * self.HEADER_RECORD.size)
+            for block in self.read_all():
+                if block.height >= count:
+                    f.write(self._pack_header(block))
+
+    def _new_entry(self, id, start):
+        """Create the manifest entry of an open segment in the format of the store"""
+        return {'id': id, 'start': start, 'end': None, 'checksum': None, 'format': self._format}
+
+    def _segment_format(self, segment):
+        """The format of the segment with the id"""
+        for entry in self._segments:
+            if entry['id'] == segment:
+                return entry.get('format', 'json')
+
+        raise IndexError(f'No segment {segment}!!!')
+
+    def _encode(self, block, format):
+        """Encode a block for a segment
+
+        Parameters:
+        ----------
+        block : Block
+            the block to be stored
+
+        format : str
+            the format of the segment
+
+        Returns:
+        ----------
+        prefix : bytes
+            the framing written before the block, the length of a binary block
+
+        data : bytes
+            the encoded block, the bytes pointed by the index record
+        """
+        if format == 'binary':
+            data = Block.serialize_binary(block)
+            return self.RECORD_LENGTH.pack(len(data)), data
+
+        return b'', (Block.serialize(block) + '\n').encode()
+
+    def _read_segment(self, entry, verify=False):
+        """Read the blocks of a segment in height order
+
+        Only the blocks with an index record are read, a block left past them by a crash
+        is not part of the store.
+
+        Parameters:
+        ----------
+        entry : dict
+            the manifest entry of the segment
+
+        verify : bool
+            check the merkle hash of each block
+
+        Returns:
+        ----------
+        blocks : Iterator[Block]
+            the blocks of the segment
+        """
+        path = self._segment_path(entry['id'])
+        last = entry['end'] if entry['end'] is not None else self._size - 1
+        count = last - entry['start'] + 1
+
+        # Each line is a block
+        if entry.get('format', 'json') == 'json':
+            with open(path, 'r') as f:
+                for line, _ in zip(f, range(count)):
+                    yield Block.deserialize(line.strip('\n'), verify)
+            return
+
+        # Each block follows its length
+        with open(path, 'rb') as f:
+            data = memoryview(f.read())
+
+        offset = 0
+        for _ in range(count):
+            length, = self.RECORD_LENGTH.unpack_from(data, offset)
+            offset += self.RECORD_LENGTH.size
+            yield Block.deserialize_binary(data[offset:offset + length], verify)
+            offset += length
+
+    def _map(self, path, end):
+        """Map a file read-only, mapping it again if it has grown past the mapped length
+
+        Parameters:
+        ----------
+        path : str
+            the path of the index or segment file
+
+        end : int
+            the number of bytes which must be mapped
+
+        Returns:
+        ----------
+        data : mmap.mmap
+            the mapped file
+        """
+        data = self._maps.get(path)
+        if data is None or len(data) < end:
+            # Earlier views keep the old map alive until they are released
+            with open(path, 'rb') as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = data
+
+        return data
+
+    def _checkpoint(self):
+        """Put the cursors and the segments back as they are now if the batch of the next append is dropped"""
+        end, size = self._end, self._size
+
+        # An append only seals the last segment and adds new ones after it
+        count = len(self._segments)
+        last = dict(self._segments[-1]) if self._segments else None
+
+        def restore():
+            self._end, self._size = end, size
+            del self._segments[count:]
+            if last is not None:
+                self._segments[-1] = last
+            if self._hashes is not None:
+                self._hashes = {hash: height for hash, height in self._hashes.items() if height < size}
+
+        self._writer.on_abort(restore)
+
+    def _roll_segment(self):
+        """Seal the open segment with its last height and checksum, and open the next one"""
+        # The checksum covers the blocks still queued in the writer, the batch of the
+        # operation is not flushed here so it still reaches the disk as one unit
+        entry = self._segments[-1]
+        entry['end'] = self._size - 1
+        entry['checksum'] = _checksum(self._segment_path(entry['id']), self._writer)
+
+        self._segments.append(self._new_entry(entry['id'] + 1, self._size))
+        self._end = 0
+        self._write_manifest()
+
+    def _read_manifest(self):
+        """Read the manifest, or rebuild it from the index for stores created without one
+
+        Returns:
+        ----------
+        segments : List[dict]
+            the manifest entries of the segments
+        """
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, 'r') as f:
+                manifest = json.loads(f.read())
+
+            self._format = manifest.get('format', 'json')
+            return manifest['segments']
+
+        if self._size == 0:
+            return []
+
+        # Group the heights of the index records by segment
+        with open(self._index_path, 'rb') as f:
+            data = f.read(self._size * self.INDEX_RECORD.size)
+
+        segments = []
+        for height, record in enumerate(self.INDEX_RECORD.iter_unpack(data)):
+            if not segments or segments[-1]['id'] != record[0]:
+                if segments:
+                    segments[-1]['end'] = height - 1
+                    segments[-1]['checksum'] = _checksum(
+                        self._segment_path(segments[-1]['id']))
+                segments.append(self._new_entry(record[0], height))
+
+        self._segments = segments
+        self._write_manifest()
+
+        return segments
+
+    def _write_manifest(self):
+        """Replace the manifest atomically, a reader sees either the old or the new one"""
+        self._writer.replace(self._manifest_path, json.dumps(
+            {'format': self._format, 'segments': self._segments}).encode())
+
+    def _read_record(self, height):
+        """Read the index record of the block at the height
+
+        Parameters:
+        ----------
+        height : int
+            the height of the block
+
+        Returns:
+        ----------
+        record : tuple
+            (segment, offset, length, raw hash) of the block
+        """
+        if height < 0 or height >= self._size:
+            raise IndexError(f'No block at height {height}!!!')
+
+        with open(self._index_path, 'rb') as f:
+            f.seek(height * self.INDEX_RECORD.size)
+            return self.INDEX_RECORD.unpack(f.read(self.INDEX_RECORD.size))
+
+    def _indexed_end(self, entry):
+        """The end of the last indexed block in a segment
+
+        Parameters:
+        ----------
+        entry : dict
+            the manifest entry of the segment
+
+        Returns:
+        ----------
+        end : int
+            the offset right after the last block of the segment with an index record
+        """
+        if self._size <= entry['start']:
+            return 0
+
+        _, offset, length, _ = self._read_record(self._size - 1)
+        return offset + length
+
+    def _segment_path(self, segment):
+        """The path of the segment file"""
+        return f'{self._path}/segment-{segment}'
+
+
+class BlockView:
+    """
+    A view of a stored block over a slice of its mapped segment.
+
+    The block is decoded on the first attribute access and the Block is kept, so a
+    view handed out and never used costs only the slice. A binary block is decoded
+    straight from the mapped segment.
+
+    ...
+
+    Attributes:
+    ----------
+    buffer : memoryview
+        the serialized block in the mapped segment
+
+    block : Block
+        the decoded block
+    """
+
+    def __init__(self, buffer, format='json'):
+        """
+        Parameters:
+        ----------
+        buffer : memoryview
+            the serialized block in the mapped segment
+
+        format : str
+            the format of the segment, 'json' or 'binary'
+        """
+        self._buffer = buffer
+        self._format = format
+        self._block = None
+
+    def __str__(self):
+        """Print the decoded block"""
+        return str(self.block)
+
+    def __getattr__(self, name):
+        """Forward the attributes of Block to the decoded block"""
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.block, name)
+
+    @property
+    def buffer(self):
+        """The serialized block in the mapped segment"""
+        return self._buffer
+
+    @property
+    def block(self):
+        """The decoded block, decoded on first use"""
+        if self._block is None:
+            self._block = _decode(self._buffer, self._format)
+        return self._block
+
+
+class BlockHeader:
+    """
+    The header of a stored block, the body is read from the store on first use.
+
+    ...
+
+    Attributes:
+    ----------
+    height : int
+        the position of the block in the blockchain
+
+    time : float
+        the creation time of the block
+
+    bits : int
+        the hardness of the PoW
+
+    nonce : int
+        the nonce of the block
+
+    prev_hash : str
+        the hash of the previous block
+
+    hash : str
+        the hash of the block
+
+    merkle_hash : str
+        the top hash of the merkle tree of the transactions
+
+    block : Block
+        the full block, read from the store
+    """
+
+    def __init__(self, height, time, bits, nonce, prev_hash, hash, merkle_hash, store):
+        """
+        Parameters:
+        ----------
+        height, time, bits, nonce, prev_hash, hash, merkle_hash
+            the header fields of the block
+
+        store : BlockStore
+            the store holding the body of the block
+        """
+        self.height = height
+        self.time = time
+        self.bits = bits
+        self.nonce = nonce
+        self.prev_hash = prev_hash
+        self.hash = hash
+        self.merkle_hash = merkle_hash
+        self._store = store
+        self._block = None
+
+    def __str__(self):
+        """Print the full block"""
+        return str(self.block)
+
+    def __getattr__(self, name):
+        """Forward the other attributes of Block to the full block"""
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.block, name)
+
+    @property
+    def block(self):
+        """The full block, read from the store on first use"""
+        if self._block is None:
+            self._block = self._store.read(self.height)
+        return self._block
+
+
+class LazyBlocks:
+    """
+    A read-only sequence of the blocks in a store, indexed like the list of blocks.
+
+    Stored blocks are handed out as BlockView instances, or as BlockHeader instances if
+    only the headers are loaded, and blocks appended after the sequence was created are
+    kept as they are, so its length never needs the segments.
+
+    ...
+
+    Attributes:
+    ----------
+    store : BlockStore
+        the store holding the blocks
+
+    headers : bool
+        whether the stored blocks are handed out as headers
+
+    Methods:
+    ----------
+    append(block) : None
+        keep a block added on top of the store
+    """
+
+    def __init__(self, store, headers=False):
+        """
+        Parameters:
+        ----------
+        store : BlockStore
+            the store holding the blocks
+
+        headers : bool
+            hand out the stored blocks as headers instead of views of the bodies
+        """
+        self._store = store
+        self._headers = headers
+        self._base = store.size
+        self._tail = []
+
+    def __len__(self):
+        """The number of blocks, stored or appended"""
+        return self._base + len(self._tail)
+
+    def __getitem__(self, key):
+        """Get the block at a height, or a list of blocks for a slice"""
+        if isinstance(key, slice):
+            return [self[height] for height in range(*key.indices(len(self)))]
+
+        if key < 0:
+            key += len(self)
+        if key < 0 or key >= len(self):
+            raise IndexError(f'No block at height {key}!!!')
+
+        if key >= self._base:
+            return self._tail[key - self._base]
+        if self._headers:
+            return self._store.header(key)
+        return self._store.view(key)
+
+    def __iter__(self):
+        """Iterate over the blocks in height order"""
+        for height in range(len(self)):
+            yield self[height]
+
+    @property
+    def store(self):
+        """The store holding the blocks"""
+        return self._store
+
+    @property
+    def headers(self):
+        """Whether the stored blocks are handed out as headers"""
+        return self._headers
+
+    def append(self, block):
+        """Keep a block added on top of the store
+
+        Parameters:
+        ----------
+        block : Block
+            the block on top of the sequence
+        """
+        self._tail.append(block)
+
+
+def _decode(data, format):
+    """Decode a block read from a segment
+
+    Parameters:
+    ----------
+    data : bytes
+        the bytes pointed by the index record, a memoryview for a mapped segment
+
+    format : str
+        the format of the segment
+
+    Returns:
+    ----------
+    block : Block
+        the decoded block
+    """
+    if format == 'binary':
+        return Block.deserialize_binary(data)
+
+    return Block.deserialize(bytes(data).decode())
+
+
+def _checksum(path, writer=None):
+    """Compute the sha256 checksum of a segment file
+
+    Parameters:
+    ----------
+    path : str
+        the path of the segment file
+
+    writer : StorageWriter
+        the writer whose queued writes to the file are part of its content, if given
+
+    Returns:
+    ----------
+    checksum : str
+        the hex encoded sha256 of the file content
+    """
+    if writer is not None:
+        return hashlib.sha256(writer.read(path)).hexdigest()
+
+    m = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            m.update(chunk)
+
+    return m.hexdigest()
+
+
+def _raw_hash(hash):
+    """Decode a base64 encoded block hash into the raw bytes kept in the index"""
+    return base64.b64decode(hash.encode())
+
+
+def _encode_hash(raw):
+    """Encode the raw bytes of a hash into the base64 text used by Block"""
+    return base64.b64encode(raw).decode()
@@ -8,15 +8,23 @@ import time
 import hashlib
 import json
 import random
+import functools
 from configparser import ConfigParser
 
 # my modules
-from ecdsa import SigningKey, VerifyingKey, NIST384p
 from Block import Block
 from PoW import PoW
 from Wallet import Wallet, WalletPool
 from MerkleTree import MerkleTree
 from Transaction_Account import Transaction, TransactionPool
+from Reporter import default_reporter
+from Retarget import Retarget
+from BlockStore import BlockStore, LazyBlocks
+from Journal import Journal
+from Storage import StorageWriter
+from Verifier import verify_batch
+from SignatureCache import SignatureCache
+from Signature import DEFAULT_SCHEME, LEGACY_SCHEME, get_scheme
 
 # TODO: Refactor CLI using decorator factory
 # TODO: Complete UTXO Model
@@ -27,6 +35,19 @@ from Transaction_Account import Transaction, TransactionPool
 # Change storage directory to the project directory
 os.chdir('../')
 
+# The number of wallet journal entries kept before they are compacted into the wallet file
+WALLET_COMPACT_INTERVAL = 64
+
+
+def batched(method):
+    """Run a Blockchain method as one batch of its storage writer, its file writes go out together"""
+    @functools.wraps(method)
+    def inner(self, *args, **kwargs):
+        with self._writer.batch():
+            return method(self, *args, **kwargs)
+
+    return inner
+
 
 class Blockchain:
     """
@@ -42,9 +63,21 @@ class Blockchain:
     bits : int 
         the PoW hardness on the current blockchain, can change between blocks
 
+    retarget : Retarget
+        the rule to adjust bits to hold the target block interval
+
+    bits_history : List[list]
+        the [height, bits] pairs at which the bits changed
+
     subsify : int
         the mining reward of a block 
 
+    workers : int
+        the number of processes used to mine a block
+
+    reporter : Reporter
+        the sink of the mining progress
+
     threshold : int
         internal variable as the trigger threshold to change the file name
 
@@ -57,6 +90,12 @@ class Blockchain:
     base_dir : str 
         the base directory name of this project
 
+    storage : str
+        the block storage layout, 'segment' for the indexed segment store, 'files' for the data-* files
+
+    scheme : SignatureScheme
+        the signature scheme of the wallets and the records
+
     wallet_num : int
         the number of wallets on the blockchain
 
@@ -66,6 +105,9 @@ class Blockchain:
     size : int
         the number blocks on the blockchain
 
+    signature_cache : SignatureCache
+        the signatures already known to be valid, with its hit and miss counters
+
 
     Methods: 
     ----------
@@ -75,8 +117,9 @@ class Blockchain:
     create_user(name) : None
         create an user with the given name in the address pool
 
-    fire_transactions(self, address) : None
-        aggregate all transactions in the blockchain in a single block and add it to the blockchain
+    fire_transactions(address, deadline, token) : bool
+        aggregate all transactions in the blockchain in a single block and add it to the blockchain,
+        can be interrupted and resumed later
 
     add_transaction(source, dest, amount) : None
         add a transaction to the transaction
@@ -84,12 +127,36 @@ class Blockchain:
     save_blockchain(path='/data') : None
         save blockchain data under the path directory 
 
-    read_blockchain(path='/data') : None
-        read all the blockchain data under the path directory
+    read_blockchain(path='/data', verify=False) : None
+        read all the blockchain data under the path directory, verify the merkle hashes if verify is set
 
     print_blocks() : None
         print all blocks in the blockchain
 
+    get_transaction_proof(record) : dict
+        return the merkle inclusion proof of a transaction record
+
+    get_block_by_hash(hash) : Block
+        return the block with the given hash
+
+    verify_block_hash(block) : bool
+        verify the PoW hash of a block against its data and nonce
+
+    verify_chain_hashes() : List[int]
+        verify the hash of every block and its link, return the heights of the invalid ones
+
+    verify_signatures(records) : List[bool]
+        verify the signatures of signed records as one batch over the worker processes
+
+    verify_block_signatures(block) : List[bool]
+        verify the signatures of all records in a block
+
+    verify_chain_signatures() : List[list]
+        verify every signature on the blockchain, return the positions of the invalid ones
+
+    verify_pending_signatures() : List[bool]
+        verify the signatures of the transactions in the pool
+
 
     Static Methods:
     ----------
@@ -97,7 +164,7 @@ class Blockchain:
         verify the top hash of the merkle tree of each block
     """
 
-    def __init__(self, bits=10, subsidy=50, threshold=100, path='/data'):
+    def __init__(self, bits=10, subsidy=50, threshold=100, path='/data', workers=1, reporter=None, retarget=None, storage='segment', fsync='none', fsync_interval=1.0, signature_cache_size=4096, persist_signatures=False, scheme=DEFAULT_SCHEME):
         """
         Parameters:
         ----------
@@ -112,9 +179,38 @@ class Blockchain:
 
         path : str
             the relative path to store the blockchain data
+
+        workers : int
+            the number of processes used to mine a block
+
+        reporter : Reporter
+            the sink of the mining progress, a status line on terminals by default
+
+        retarget : Retarget
+            the rule to adjust bits between blocks, the bits stay fixed if not given
+
+        storage : str
+            the block storage of a new blockchain, 'segment' or 'files', a read blockchain keeps its own
+
+        fsync : str
+            the durability of each operation, 'none', 'batch' or 'interval', see StorageWriter
+
+        fsync_interval : float
+            the minimal number of seconds between two fsyncs of the 'interval' policy
+
+        signature_cache_size : int
+            the maximal number of valid signatures remembered, they are not verified again
+
+        persist_signatures : bool
+            save the remembered signatures under the info directory to be used after a restart
+
+        scheme : str
+            the id of the signature scheme of a new blockchain, a read blockchain keeps its own
         """
         self._blocks = []
         self._bits = bits
+        self._retarget = retarget if retarget is not None else Retarget()
+        self._bits_history = []
         self._subsidy = subsidy
         self._root_address = None
         self._wallet_pool = WalletPool()
@@ -128,6 +224,19 @@ class Blockchain:
         self._data_path = self._base_dir + '/data'
         self._data_file = None
         self._wallet_file = None
+        self._wallet_journal = None
+        self._wallet_batch = None
+        self._transaction_journal = None
+        self._storage = storage
+        self._scheme = get_scheme(scheme)
+        self._store = None
+        self._writer = StorageWriter(
+            fsync, fsync_interval, wal_path=self._info_path + '/wal')
+        self._workers = workers
+        self._reporter = reporter if reporter is not None else default_reporter()
+        self._template = None
+        self._signature_cache = SignatureCache(
+            signature_cache_size, self._info_path + '/sigcache' if persist_signatures else None, self._writer)
 
     @property
     def blocks(self):
@@ -139,11 +248,26 @@ class Blockchain:
         """The hardness of the blockchain"""
         return self._bits
 
+    @property
+    def retarget(self):
+        """The rule to adjust bits between blocks"""
+        return self._retarget
+
+    @property
+    def bits_history(self):
+        """The heights at which the bits changed"""
+        return self._bits_history
+
     @property
     def subsidy(self):
         """The miner reward of the blockchain"""
         return self._subsidy
 
+    @property
+    def workers(self):
+        """The number of processes used to mine a block"""
+        return self._workers
+
     @property
     def threshold(self):
         """The maximal number of transactions in a block"""
@@ -164,6 +288,26 @@ class Blockchain:
         """The base directory of the storage path"""
         return self._base_dir
 
+    @property
+    def writer(self):
+        """The storage writer grouping the file writes of each operation"""
+        return self._writer
+
+    @property
+    def storage(self):
+        """The block storage layout"""
+        return self._storage
+
+    @property
+    def scheme(self):
+        """The signature scheme of the wallets and the records"""
+        return self._scheme
+
+    @property
+    def signature_cache(self):
+        """The signatures already known to be valid"""
+        return self._signature_cache
+
     @property
     def tx_num(self):
         """The number of uncommited transactions"""
@@ -179,6 +323,7 @@ class Blockchain:
         """The number of blocks on the blockchain"""
         return len(self._blocks)
 
+    @batched
     def initialize(self, name):
         """Initialize the blockchain
 
@@ -196,8 +341,17 @@ class Blockchain:
             os.mkdir(self._data_path)
 
         # Open file handler to save initialization data
-        self._wallet_file = open(f'{self._info_path}/wallet', 'w+')
-        self._data_file = open(f'{self._data_path}/data-0', 'w+')
+        self._wallet_file = f'{self._info_path}/wallet'
+        self._writer.truncate(self._wallet_file)
+        self._wallet_journal = Journal(f'{self._info_path}/wallet-journal', self._writer)
+        self._wallet_journal.reset()
+        self._transaction_journal = Journal(f'{self._info_path}/transactions', self._writer)
+        self._transaction_journal.reset()
+        if self._storage == 'segment':
+            self._store = BlockStore(self._data_path, writer=self._writer)
+        else:
+            self._data_file = f'{self._data_path}/data-0'
+            self._writer.truncate(self._data_file)
 
         # Create the root user
         wallet = self.create_user(name)
@@ -209,6 +363,7 @@ class Blockchain:
         # Create the genesis block
         genesis_block = self._new_genesis_block(wallet.address)
         self._blocks.append(genesis_block)
+        self._bits_history = [[genesis_block.height, genesis_block.bits]]
 
         # Save the initialization data
         self._save_metadata()
@@ -216,6 +371,7 @@ class Blockchain:
 
         return wallet
 
+    @batched
     def create_user(self, name):
         """Create an user in the blockchain
 
@@ -225,11 +381,11 @@ class Blockchain:
             create an user based on the given name
         """
         # Create and add a wallet to the wallet pool
-        wallet = Wallet(name, 0)
+        wallet = Wallet(name, 0, scheme=self._scheme.name)
         self._wallet_pool.add_wallet(wallet)
 
-        # Update the wallet pool data
-        self._save_wallet_pool_data()
+        # Journal the new wallet
+        self._append_wallet_entry({'wallets': [Wallet.serialize(wallet)]})
 
         return wallet
 
@@ -260,7 +416,7 @@ class Blockchain:
         print(f'Try to get Block! {transactions} ...')
 
         # Compute the hash of the block
-        block.set_hash()
+        block.set_hash(self._workers, self._reporter)
 
         print(f'\nGet Block!!!', end='\n\n')
         return block
@@ -290,22 +446,23 @@ class Blockchain:
 
         return block
 
-    def _add_block(self, transactions):
-        """Create a new block and add it to the blockchain
+    def _add_block(self, block):
+        """Add a mined block to the blockchain and save it
 
         Parameters:
         ---------- 
-        transactions : List[str]
-            the transactions records of the created block
+        block : Block
+            the mined block on top of the last block
         """
-        # Get the hash of the previous block
-        prev_block = self._blocks[-1]
+        self._blocks.append(block)
 
-        # Create and append a new block to the blockchain
-        new_block = self._new_block(
-            prev_block.height, transactions, prev_block.hash)
+        # Record the retarget in the history
+        if block.bits != self._bits:
+            self._bits = block.bits
+            self._bits_history.append([block.height, block.bits])
 
-        self._blocks.append(new_block)
+        # Save the block data
+        self._save_block_data(block)
 
     @staticmethod
     def verify_blocks(block1, block2):
@@ -323,17 +480,107 @@ class Blockchain:
         return block1.merkle_tree.hash == block2.merkle_tree.hash
 
     def verify_block_hash(self, block):
-        # TODO: verify all transactions in the block and also the hash of the block
-        pass
+        """Verify the PoW hash of the block against its data and nonce
+
+        Parameters:
+        ----------
+        block : Block
+            a block
+
+        Returns:
+        ----------
+        result : bool
+            whether the stored hash commits to the block and meets its bits
+        """
+        return block.verify_hash()
+
+    def verify_chain_hashes(self):
+        """Verify the PoW hash of every block and its link to the block before it
+
+        Returns:
+        ----------
+        invalid : List[int]
+            the heights of the blocks with an invalid hash or previous hash
+        """
+        invalid = []
+        prev_hash = None
+        for block in self._blocks:
+            if not self.verify_block_hash(block) or (prev_hash is not None and block.prev_hash != prev_hash):
+                invalid.append(block.height)
+            prev_hash = block.hash
+
+        return invalid
 
     def verify_merkle_hash(self, block):
-        # TODO: verify the merkle hash of the block
-        pass
+        """Verify the merkle hash of the block against its transactions
+
+        Parameters:
+        ----------
+        block : Block
+            a block
+
+        Returns:
+        ----------
+        result : bool
+            whether the merkle hash matches the transactions
+        """
+        return block.verify_merkle()
 
     def verify_transaction_hash(self, tx):
         # TODO: verify a transaction hash
         pass
 
+    def get_transaction_proof(self, record):
+        """Return the merkle inclusion proof of a transaction record
+
+        A light client checks the proof against the merkle hash of the block header with
+        MerkleTree.verify_proof(record, proof, merkle_hash), without the other transactions.
+
+        Parameters:
+        ----------
+        record : str
+            the signed transaction record
+
+        Returns:
+        ----------
+        proof : dict
+            the height, hash and merkle hash of the block holding the record, the position
+            of the record in the block and the proof, None if the record is not on the blockchain
+        """
+        for block in self._blocks:
+            if record not in block.transactions:
+                continue
+
+            index = block.transactions.index(record)
+            return {'height': block.height, 'hash': block.hash, 'merkle_hash': block.merkle_hash,
+                    'index': index, 'proof': block.merkle_tree.get_proof(index)}
+
+        return None
+
+    def get_block_by_hash(self, hash):
+        """Return the block with the given hash
+
+        Parameters:
+        ----------
+        hash : str
+            the base64 encoded hash of the block
+
+        Returns:
+        ----------
+        block : Block
+            the block with the hash, None if not found
+        """
+        # The segment store finds the height in its index
+        if self._store is not None:
+            height = self._store.get_height(hash)
+            return self._blocks[height] if height is not None else None
+
+        for block in self._blocks:
+            if block.hash == hash:
+                return block
+
+        return None
+
     def _append_block(self, block):
         # TODO: the next function to call after a block is verified
         pass
@@ -342,8 +589,8 @@ class Blockchain:
         # TODO: a wrapper function for verification and synchronize the blockchain
         pass
 
-    def _new_coinbase_tx_account(self, transactions, address):
-        """Add reward to the miner and add a block to the blockchain
+    def _new_coinbase_tx_account(self, transactions, address, merkle_tree=None):
+        """Add the reward transaction for the miner and create the block template
 
         Parameters:
         ----------
@@ -352,61 +599,157 @@ class Blockchain:
 
         address : str
             the address of the miner 
+
+        merkle_tree : MerkleTree
+            the merkle tree already built on the transactions, owned by the block afterwards
+
+        Returns:
+        ----------
+        block : Block
+            the block on top of the last block, not mined yet
         """
         # Create and sign a reward transaction
         miner_data = f'Reward ${self.subsidy} to {address}'
         sign_data = self._sign_transaction(address, miner_data)
 
-        # Add a block to the blockchain
-        transactions.append(sign_data)
-        self._add_block(transactions)
+        if merkle_tree is None:
+            transactions.append(sign_data)
+        else:
+            # Appending to the tree adds the reward to its transactions and updates the root
+            merkle_tree.append(sign_data)
+            transactions = merkle_tree.leaves
 
-        # Add reward to miner's account
-        self.increment_balance(address, self._subsidy)
+        # Get the hash of the previous block
+        prev_block = self._blocks[-1]
 
-        # Save the block data
-        self._save_block_data(self._blocks[-1])
+        # Follow the retarget rule for the bits of the new block
+        bits = self._retarget.next_bits(self._blocks, len(self._blocks))
 
-    def fire_transactions(self, address):
-        """Aggregate all transactions in the blockchain in a single block and add it to the blockchain, internal method
+        return Block(prev_block.height, time.time(), bits, 0, transactions, prev_block.hash, merkle_tree)
+
+    def _new_template(self, address):
+        """Select the valid transactions of the pool and create a block template
 
         Parameters:
-        ---------- 
+        ----------
         address : str
             the address of the miner
+
+        Returns:
+        ----------
+        template : dict
+            the block to be mined, the balance moves to apply once mined, the nonce cursor
+            and the pool versions the template was built from
         """
-        # Retrieve transactions records and tranferred data
-        balance_pool = self._transaction_pool.balance
-        record_pool = self._transaction_pool.records
+        # Track the balances as if the transactions before had been applied
+        balances = dict()
         records = []
+        moves = []
+
+        for tx in self._transaction_pool.transactions:
+            source, dest, amount = tx.balance
+            if source not in balances:
+                balances[source] = self._wallet_pool.wallet_balance(source)
+            if dest not in balances:
+                balances[dest] = self._wallet_pool.wallet_balance(dest)
 
-        # Move money between account based on each transaction
-        for i in range(len(balance_pool)):
-            source, dest, amount = balance_pool[i]
             # Check if the source wallet has enough balance
-            if not self.have_balance(source, amount):
+            if balances[source] < amount:
                 print(f'{source} has no enough balance !!!')
                 continue
 
-            # Actually make a transaction
-            self.move_balance(source, dest, amount)
+            balances[source] -= amount
+            balances[dest] += amount
 
             # Add valid transaction records in the list
-            records.append(record_pool[i])
+            moves.append(tx.balance)
+            records.append(tx.signed_record)
+
+        # The pool keeps the merkle tree of its records up to date, reuse it if none is skipped
+        merkle_tree = None
+        if len(records) == self._transaction_pool.size:
+            merkle_tree = self._transaction_pool.merkle_tree.copy()
+
+        # Add transactions records in the block
+        block = self._new_coinbase_tx_account(records, address, merkle_tree)
+
+        return {'block': block, 'moves': moves, 'cursor': 0, 'address': address,
+                'version': self._transaction_pool.version,
+                'balances': self._wallet_pool.version}
+
+    @batched
+    def fire_transactions(self, address, deadline=None, token=None):
+        """Aggregate all transactions in the blockchain in a single block and add it to the blockchain, internal method
+
+        The mining can be interrupted by the deadline or the token, the block template is kept
+        and the next call resumes it from where it stopped. The template is built again with
+        the fresh transactions if the pool or any balance has changed in between, since the
+        selected transactions are only valid for the balances they were checked against.
+
+        Parameters:
+        ---------- 
+        address : str
+            the address of the miner
+
+        deadline : float (unix timestamp)
+            the time to give up mining, mine until the block is found if it is None
 
-        # Add transactions records in the blockchain
-        self._new_coinbase_tx_account(records, address)
+        token : CancelToken
+            the token to cancel mining from another thread
+
+        Returns:
+        ----------
+        result : bool
+            whether the block has been mined and added to the blockchain
+        """
+        # Reuse the unfinished template if nothing has changed since it was built
+        template = self._template
+        if (template is None or template['version'] != self._transaction_pool.version
+                or template['balances'] != self._wallet_pool.version or template['address'] != address):
+            template = self._new_template(address)
+            self._template = template
+
+        block = template['block']
+        print(f'Try to get Block! {block.transactions} ...')
+
+        # Compute the hash of the block
+        result = block.mine(template['cursor'], deadline, token,
+                            self._workers, self._reporter)
+
+        # Keep the template and the cursor to resume mining later
+        if not result.found:
+            template['cursor'] = result.cursor
+            print(f'\nStop mining at nonce {result.cursor}', end='\n\n')
+            return False
+
+        print(f'\nGet Block!!!', end='\n\n')
+        self._template = None
+
+        # Collect the balance changes of the block into a single journal entry
+        self._wallet_batch = dict()
+
+        # Move money between account based on each transaction
+        for source, dest, amount in template['moves']:
+            self.move_balance(source, dest, amount)
+
+        # Add the block to the blockchain
+        self._add_block(block)
+
+        # Add reward to miner's account
+        self.increment_balance(address, self._subsidy)
 
         # Save updated account data
-        self._save_wallet_pool_data()
+        self._commit_wallet_batch()
 
         # Clear the transaction records and balance
         self._transaction_pool.reset()
 
-        # Clear the transaction file
-        with open(f'{self._info_path}/transactions', 'w+') as f:
-            pass
+        # Clear the transaction journal, the mined transactions are in the block now
+        self._transaction_journal.reset()
+
+        return True
 
+    @batched
     def add_transaction(self, source, dest, amount):
         """Add a transaction to the transaction pool
 
@@ -421,6 +764,10 @@ class Blockchain:
         amount : int
             the amount that moving between accounts 
         """
+        # Check both accounts exist
+        for address in (source, dest):
+            if not self._wallet_pool.has_address(address):
+                raise ValueError(f'The address {address} does not exist!!!')
 
         # Check if sender have enough balance
         if not self.have_balance(source, amount):
@@ -430,18 +777,23 @@ class Blockchain:
         # Create a transaction
         tx = Transaction(source, dest, amount)
         sk = self._wallet_pool.get_wallet_signing_key(source)
-        Transaction.sign(tx, sk)
+        Transaction.sign(tx, sk, self._scheme)
+
+        # Admit only a record with a valid signature, it is remembered in the signature cache
+        if not self._verify_transaction(source, tx.signed_record):
+            raise ValueError(f'The transaction of {source} has an invalid signature!!!')
 
         # Add transaction on the blockchain
         self._transaction_pool.add_transaction(tx)
 
+        # Append the transaction to the journal
+        self._transaction_journal.append(
+            json.loads(Transaction.serialize(tx)))
+
         # If the number of transactions reaches the threshold, create a new block
         if self._transaction_pool.size >= self._threshold:
             self.fire_transactions(source)
 
-        # Save transaction data
-        self._save_transaction_data()
-
     def _sign_transaction(self, source, tx_data):
         """Sing a transaction and add signature to the transaction
 
@@ -461,7 +813,7 @@ class Blockchain:
 
         # Sign the transaction and add signature after the transaction
         sk = self._wallet_pool.get_wallet_signing_key(source)
-        signature = base58.b58encode(sk.sign(tx_data.encode())).decode()
+        signature = base58.b58encode(self._scheme.sign(sk, tx_data.encode())).decode()
         sign_data = tx_data + '|' + signature
 
         return sign_data
@@ -481,15 +833,149 @@ class Blockchain:
         ----------
         result : bool
             the result of whether the transaction is valid
+
+        Raises:
+        ----------
+        ValueError
+            if the sender account does not exist
         """
+        if not self._wallet_pool.has_address(source):
+            raise ValueError(f'The address {source} does not exist!!!')
+
         # Process the signed transaction
-        vk = self._wallet_pool.get_wallet_verifying_key(source)
         tx_data, signature = sign_data.split('|')
         tx_data = tx_data.encode()
         signature = base58.b58decode(signature.encode())
 
+        # Skip a signature already known to be valid
+        key = SignatureCache.key(self._scheme.name, self._wallet_pool.get_wallet(source).vk_bytes, tx_data, signature)
+        if self._signature_cache.contains(key):
+            return True
+
         # Verify the signature
-        return vk.verify(signature, tx_data)
+        vk = self._wallet_pool.get_wallet_verifying_key(source)
+        if not self._scheme.verify(vk, tx_data, signature):
+            return False
+
+        self._signature_cache.add(key)
+        self._save_signature_cache()
+        return True
+
+    def verify_signatures(self, records):
+        """Verify the signatures of signed records as one batch over the worker processes
+
+        The signer of a record is the source of a transaction, the miner of a reward and the
+        root account for the genesis record.
+
+        Parameters:
+        ----------
+        records : List[str]
+            the signed records
+
+        Returns:
+        ----------
+        results : List[bool]
+            whether each record has a valid signature of its signer
+        """
+        items = [self._signature_item(record) for record in records]
+        results = [item is not None for item in items]
+
+        # Only the signatures not known to be valid go to the workers
+        keys = [SignatureCache.key(self._scheme.name, *item) if item is not None else None for item in items]
+        missed = [i for i, key in enumerate(keys)
+                  if key is not None and not self._signature_cache.contains(key)]
+
+        for i, result in zip(missed, verify_batch([items[i] for i in missed], self._scheme, self._workers)):
+            results[i] = result
+            if result:
+                self._signature_cache.add(keys[i])
+
+        self._save_signature_cache()
+
+        return results
+
+    def verify_block_signatures(self, block):
+        """Verify the signatures of all records in a block
+
+        Parameters:
+        ----------
+        block : Block
+            the block to be checked
+
+        Returns:
+        ----------
+        results : List[bool]
+            whether each record of the block has a valid signature
+        """
+        return self.verify_signatures(block.transactions)
+
+    def verify_chain_signatures(self):
+        """Verify the signatures of all records on the blockchain as a single batch
+
+        Returns:
+        ----------
+        invalid : List[list]
+            the [height, index] of each record with an invalid signature
+        """
+        positions = []
+        records = []
+        for block in self._blocks:
+            for index, record in enumerate(block.transactions):
+                positions.append([block.height, index])
+                records.append(record)
+
+        results = self.verify_signatures(records)
+        return [position for position, result in zip(positions, results) if not result]
+
+    def verify_pending_signatures(self):
+        """Verify the signatures of the transactions in the pool
+
+        Returns:
+        ----------
+        results : List[bool]
+            whether each pending transaction has a valid signature
+        """
+        return self.verify_signatures(self._transaction_pool.records)
+
+    def _save_signature_cache(self):
+        """Save the signature cache if it has new signatures, within the batch of the running operation"""
+        if self._signature_cache.changed:
+            self._signature_cache.save()
+
+    def _signature_item(self, record):
+        """Split a signed record into the raw key of its signer, the message and the signature
+
+        Parameters:
+        ----------
+        record : str
+            the signed record
+
+        Returns:
+        ----------
+        item : tuple
+            (raw verifying key, message, signature), None if the signer or the signature is unknown
+        """
+        message, _, signature = record.rpartition('|')
+
+        if message.startswith('from: '):
+            signer = message[len('from: '):].split(' -- ', 1)[0]
+        elif message.startswith('Reward $'):
+            signer = message.rsplit(' to ', 1)[-1]
+        elif message == 'This is the genesis block!!!':
+            signer = self._root_address
+        else:
+            return None
+
+        if not self._wallet_pool.has_address(signer):
+            return None
+
+        try:
+            signature = base58.b58decode(signature)
+        except ValueError:
+            return None
+
+        # The raw key is sent to the workers, the wallet does not need to decode it
+        return (self._wallet_pool.get_wallet(signer).vk_bytes, message.encode(), signature)
 
     def get_balance(self, address):
         """Get the balance of an account
@@ -528,6 +1014,7 @@ class Blockchain:
         else:
             return False
 
+    @batched
     def increment_balance(self, address, amount):
         """Increment an account's balance
 
@@ -538,8 +1025,9 @@ class Blockchain:
             the amount of balance to be incremented
         """
         self._wallet_pool.add_balance(address, amount)
-        self._save_wallet_pool_data()
+        self._record_balance_change(address, amount)
 
+    @batched
     def decrement_balance(self, address, amount):
         """decrement an account's balance
 
@@ -550,7 +1038,7 @@ class Blockchain:
             the amount of balance to be decremented
         """
         self._wallet_pool.sub_balance(address, amount)
-        self._save_wallet_pool_data()
+        self._record_balance_change(address, -amount)
 
     def move_balance(self, source, dest, amount):
         """Move balance from source account to dest account
@@ -567,6 +1055,49 @@ class Blockchain:
         self.decrement_balance(source, amount)
         self.increment_balance(dest, amount)
 
+    def _record_balance_change(self, address, delta):
+        """Journal a balance change, or add it to the batch of the block being committed
+
+        Parameters:
+        ----------
+        address : str
+            the account address
+
+        delta : int
+            the change of the balance
+        """
+        if self._wallet_batch is not None:
+            self._wallet_batch[address] = self._wallet_batch.get(
+                address, 0) + delta
+        else:
+            self._append_wallet_entry({'deltas': {address: delta}})
+
+    def _commit_wallet_batch(self):
+        """Journal the balance changes of a block as one entry"""
+        batch = self._wallet_batch
+        self._wallet_batch = None
+
+        # Only the accounts changed by the block are written
+        deltas = {address: delta for address,
+                  delta in batch.items() if delta != 0}
+        if deltas:
+            self._append_wallet_entry({'deltas': deltas})
+
+    def _append_wallet_entry(self, entry):
+        """Append an entry to the wallet journal, and compact the journal once it has enough entries
+
+        Parameters:
+        ----------
+        entry : dict
+            the new wallets or the balance changes
+        """
+        self._wallet_journal.append(entry)
+
+        # Every write path compacts, so a load never replays more than the interval
+        if self._wallet_journal.size >= WALLET_COMPACT_INTERVAL:
+            self._save_wallet_pool_data()
+
+    @batched
     def save_blockchain(self, path='/data'):
         """Save blockchain data under the path folder under the project directory
 
@@ -610,15 +1141,15 @@ class Blockchain:
         if not os.path.exists(base_dir):
             os.mkdir(base_dir)
 
-        # Save the metadata
-        with open(f'{base_dir}/metadata', 'w+') as f:
-            # Create a dictionary contains blockchain metadata
-            d = {'bits': self._bits, 'subsidy': self._subsidy, 'height': len(
-                self._blocks), 'count': self._count, 'index': self._index, 'root_address': self._root_address}
+        # Create a dictionary contains blockchain metadata
+        d = {'bits': self._bits, 'subsidy': self._subsidy, 'height': len(
+            self._blocks), 'count': self._count, 'index': self._index, 'root_address': self._root_address,
+            'retarget': Retarget.serialize(self._retarget), 'bits_history': self._bits_history,
+            'storage': self._storage, 'scheme': self._scheme.name}
 
-            # Dump data to json formatted data and save it
-            data = json.dumps(d)
-            f.write(data + '\n')
+        # Dump data to json formatted data and replace the metadata with it
+        data = json.dumps(d)
+        self._writer.replace(f'{base_dir}/metadata', (data + '\n').encode())
 
     def _save_wallet_data(self, wallet, path='/data/info'):
         """Save an account address
@@ -634,11 +1165,15 @@ class Blockchain:
         # Get the base directory
         base_dir = os.getcwd() + path
         data = Wallet.serialize(wallet)
-        self._wallet_file.write(data + '\n')
+        self._writer.append(self._wallet_file, (data + '\n').encode())
 
     def _save_wallet_pool_data(self, path='/data/info'):
         """Save all account address
 
+        This compacts the wallet journal, the snapshot records the sequence number of the
+        last journal entry it holds on its first line and replaces the wallet file at once,
+        then the journal is emptied.
+
         Parameters: 
         ---------
         path : str
@@ -647,29 +1182,33 @@ class Blockchain:
         # Get the base directory
         base_dir = os.getcwd() + path
 
-        # Reset the address file
-        self._wallet_file.close()
-
         # Save the address data
-        with open(f'{base_dir}/wallet', 'w+') as f:
-            for address, wallet in self._wallet_pool.wallets:
-                data = Wallet.serialize(wallet)
-                f.write(data + '\n')
+        lines = [json.dumps({'seq': self._wallet_journal.seq})]
+        for address, wallet in self._wallet_pool.wallets:
+            data = Wallet.serialize(wallet)
+            lines.append(data)
+        self._writer.replace(f'{base_dir}/wallet',
+                             ('\n'.join(lines) + '\n').encode())
+
+        self._wallet_journal.reset()
 
     def _save_transaction_data(self, path='/data/info'):
         """Save the unprocessed transaction data
 
+        The transaction journal is replaced at once with the transactions of the pool.
+
         Parameters:
         ----------
         path : str
             the path to store the transaction data
         """
         base_dir = os.getcwd() + path
+        if self._transaction_journal is None:
+            self._transaction_journal = Journal(f'{base_dir}/transactions', self._writer)
+
         # Save transactions data record
-        with open(f'{base_dir}/transactions', 'w+') as f:
-            for tx in self._transaction_pool.transactions:
-                data = Transaction.serialize(tx)
-                f.write(data + '\n')
+        self._transaction_journal.rewrite([json.loads(Transaction.serialize(tx))
+                                           for tx in self._transaction_pool.transactions])
 
     def _save_genesis_data(self, path='/data/data'):
         """Save genesis block data
@@ -681,10 +1220,15 @@ class Blockchain:
         """
         base_dir = os.getcwd() + path
 
+        # The genesis block is the first block of the segment store
+        if self._store is not None:
+            if self._store.size == 0:
+                self._store.append(self._blocks[0])
+            return
+
         # Save the genesis block
-        with open(f'{base_dir}/genesis', 'w+') as f:
-            data = Block.serialize(self._blocks[0])
-            f.write(data + '\n')
+        data = Block.serialize(self._blocks[0])
+        self._writer.replace(f'{base_dir}/genesis', (data + '\n').encode())
 
     def _save_block_data(self, block, path='/data/data'):
         """Save a block data
@@ -697,6 +1241,12 @@ class Blockchain:
         path : str
             the path to store the block data
         """
+        # Append the block to the segment store
+        if self._store is not None:
+            self._store.append(block)
+            self._save_metadata()
+            return
+
         # Serialize the block
         data = Block.serialize(block)
 
@@ -705,11 +1255,11 @@ class Blockchain:
 
         # Create a new file for incoming data if we have too many block in this data file
         if self._count != 0 and self._count % self._threshold == 0:
-            self._data_file.close()
-            self._data_file = open(f'{self.base_dir}/data-{self.index}', 'w+')
+            self._data_file = f'{self._data_path}/data-{self._index}'
+            self._writer.truncate(self._data_file)
 
         self._count += 1
-        self._data_file.write(data + '\n')
+        self._writer.append(self._data_file, (data + '\n').encode())
         self._save_metadata()
 
     def _save_blocks_data(self, path='/data/data'):
@@ -720,8 +1270,11 @@ class Blockchain:
         path : str
             the path to store the blocks data
         """
-        # Reset the data file
-        self._data_file.close()
+        # The segment store is append-only, only the missing blocks are appended
+        if self._store is not None:
+            for block in self._blocks[self._store.size:]:
+                self._store.append(block)
+            return
 
         base_dir = os.getcwd() + path
 
@@ -730,42 +1283,78 @@ class Blockchain:
         index = 0
         threshold = 100
 
-        f = open(f'{base_dir}/data-{index}', 'w+')
+        lines = []
         # Serialize all blocks and save them to the current file
         for block in self._blocks[1:]:
             index = count // threshold
-            # Create a new file if we have too many data in the current file
+            # Replace the current file at once if we have too many data in it
             if count != 0 and count % threshold == 0:
-                f.close()
-                f = open(f'{base_dir}/data-{index}', 'w+')
+                self._writer.replace(f'{base_dir}/data-{index - 1}', b''.join(lines))
+                lines = []
 
             count += 1
 
-            # Serialized the block and save it to the current file
+            # Serialized the block and queue it for the current file
             data = Block.serialize(block)
-            f.write(data + '\n')
+            lines.append((data + '\n').encode())
 
-        f.close()
+        self._writer.replace(f'{base_dir}/data-{index}', b''.join(lines))
 
-    def read_blockchain(self, path='/data'):
+    def read_blockchain(self, path='/data', verify=False, lazy=False, headers=False):
         """Read the blockchain data 
 
         Parameters:
         ----------
         path : str
             the path to read the blockchain data
+
+        verify : bool
+            rebuild the merkle tree of each block and check it against the stored merkle hash
+
+        lazy : bool
+            map the segment store and decode a block only when it is used, for read-only
+            commands, the retarget rule is not checked, blockchains in data-* files are read fully
+
+        headers : bool
+            load only the block headers of the segment store, a body is read when one of its
+            transactions is needed, the retarget rule is checked on the headers
         """
         info_path = path + '/info'
         data_path = path + '/data'
 
-        self._wallet_file = open(f'{self.base_dir}/info/wallet', 'a+')
-        self._data_file = open(
-            f'{self.base_dir}/data/data-{self._index}', 'a+')
+        # Finish the last operation if it was interrupted, only its logged writes are redone
+        if self._writer.recover():
+            print('Recovered the interrupted operation!!!')
+
+        # The metadata tells the storage layout of the blocks
         self._read_metadata(info_path)
+
+        self._wallet_file = f'{self.base_dir}/info/wallet'
         self._read_wallet_pool_data(info_path)
         self._read_transaction_data(info_path)
-        self._read_genesis_data(data_path)
-        self._read_blocks_data(data_path)
+        self._signature_cache.load()
+
+        if self._storage == 'segment':
+            self._store = BlockStore(os.getcwd() + data_path, writer=self._writer)
+
+            # Nothing is read from the segments until a block is used
+            if lazy and not verify:
+                self._blocks = LazyBlocks(self._store)
+                return
+
+            if headers and not verify:
+                self._blocks = LazyBlocks(self._store, headers=True)
+            else:
+                self._blocks = list(self._store.read_all(verify))
+        else:
+            self._data_file = f'{self.base_dir}/data/data-{self._index}'
+            self._read_genesis_data(data_path, verify)
+            self._read_blocks_data(data_path, verify)
+
+        # Check the bits of every block against the retarget rule
+        self._retarget.validate(self._blocks)
+        if not self._bits_history:
+            self._bits_history = Retarget.history(self._blocks)
 
     def _read_metadata(self, path='/data/info'):
         """Read the blockchain metadata
@@ -795,6 +1384,16 @@ class Blockchain:
             self._index = metadata['index']
             self._root_address = metadata['root_address']
 
+            # Chains created before retargeting keep fixed bits
+            self._retarget = Retarget.deserialize(metadata.get('retarget'))
+            self._bits_history = metadata.get('bits_history', [])
+
+            # Chains created before the segment store keep the data-* files
+            self._storage = metadata.get('storage', 'files')
+
+            # Chains created before the signature schemes sign with the legacy one
+            self._scheme = get_scheme(metadata.get('scheme', LEGACY_SCHEME))
+
     def _read_wallet_pool_data(self, path='/data/info'):
         """Read the blockchain account data from the path
 
@@ -804,6 +1403,7 @@ class Blockchain:
             the path to read the blockchain account data
         """
         base_dir = os.getcwd() + path
+        seq = 0
 
         # Read address data
         with open(f'{base_dir}/wallet', 'r') as f:
@@ -811,9 +1411,24 @@ class Blockchain:
             for line in f:
                 # Process account data
                 raw_data = line.strip('\n')
+
+                # The first line of a snapshot is the last journal entry it holds
+                if raw_data.startswith('{"seq"'):
+                    seq = json.loads(raw_data)['seq']
+                    continue
+
                 wallet = Wallet.deserialize(raw_data)
                 self._wallet_pool.add_wallet(wallet)
 
+        # Replay the journal entries written after the snapshot
+        self._wallet_journal = Journal(f'{base_dir}/wallet-journal', self._writer)
+        for entry in self._wallet_journal.replay(seq):
+            for raw_data in entry.get('wallets', []):
+                self._wallet_pool.add_wallet(Wallet.deserialize(raw_data))
+
+            for address, delta in entry.get('deltas', {}).items():
+                self._wallet_pool.add_balance(address, delta)
+
     def _read_transaction_data(self, path='/data/info'):
         """Read the unprocessed transaction data
 
@@ -824,58 +1439,51 @@ class Blockchain:
         """
         base_dir = os.getcwd() + path
 
-        if not os.path.exists(f'{base_dir}/transactions'):
-            return
-
-        # Read transaction data
-        with open(f'{base_dir}/transactions', 'r') as f:
-            # Each line data is a transaction
-            for line in f:
-                # Process the transaction
-                raw_data = line.strip('\n')
-                tx = Transaction.deserialize(raw_data)
+        # Replay the transaction journal, the file is kept and new transactions are appended
+        self._transaction_journal = Journal(f'{base_dir}/transactions', self._writer)
+        for entry in self._transaction_journal.replay():
+            tx = Transaction.deserialize(json.dumps(entry))
 
-                # Add the transaction back to the transaction pool
-                self._transaction_pool.add_transaction(tx)
+            # Add the transaction back to the transaction pool
+            self._transaction_pool.add_transaction(tx)
 
-        # Unknown: need to test whether it will affect the functionality
-        with open(f'{base_dir}/transactions', 'w+') as f:
-            pass
-
-    def _read_genesis_data(self, path='/data/data'):
+    def _read_genesis_data(self, path='/data/data', verify=False):
         """Read the genesis block data
 
         Parameters:
         ---------
         path : str
             the path to read the genesis block data
+
+        verify : bool
+            check the merkle hash of the block
         """
         base_dir = os.getcwd() + path
 
         # Read the genesis block
         with open(f'{base_dir}/genesis', 'r') as f:
             data = f.read().strip('\n')
-            block = Block.deserialize(data)
+            block = Block.deserialize(data, verify)
             self._blocks.append(block)
 
-    def _read_blocks_data(self, path='/data/data'):
+    def _read_blocks_data(self, path='/data/data', verify=False):
         """Read the blocks data
 
         Parameters:
         ----------
         path : str
             the path to read all blocks data
+
+        verify : bool
+            check the merkle hash of each block
         """
         base_dir = os.getcwd() + path
 
-        # Get all file in the directory
-        dir_list = os.listdir(base_dir)
-
-        # Remove genesis block data
-        dir_list.remove(f'genesis')
+        # Get all data files in the directory, the genesis block is read separately
+        dir_list = [file for file in os.listdir(base_dir) if file.startswith('data-')]
 
-        # Sort the file to get the right time sequence
-        sort_dir = sorted(dir_list)
+        # Sort the file by its number to get the right time sequence, data-10 comes after data-2
+        sort_dir = sorted(dir_list, key=lambda file: int(file.split('-')[1]))
 
         # Read data from each file under the directory
         for file in sort_dir:
@@ -886,7 +1494,7 @@ class Blockchain:
                     data = line.strip('\n')
 
                     # Save the block back into the blockchain
-                    block = Block.deserialize(data)
+                    block = Block.deserialize(data, verify)
                     self._blocks.append(block)
 
     def print_blocks(self, height=-1, direction='back'):
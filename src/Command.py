@@ -1,4 +1,6 @@
 from Blockchain import Blockchain
+from Retarget import Retarget
+from Migration import strip_duplicate_transactions, convert_files_to_segments, convert_segments
 import os
 
 
@@ -57,12 +59,22 @@ def execute_create_blockchain(arg):
     ----------
     name : str
         the root user name
+
+    workers : int
+        the number of processes used to mine a block
+
+    interval : float
+        the target seconds between blocks, the hardness stays fixed if not given
+
+    scheme : str
+        the signature scheme of the wallets and the records
     """
     path = os.getcwd() + '/data'
     info_path = path + '/info'
     data_path = path + '/data'
 
-    blockchain = Blockchain()
+    blockchain = Blockchain(workers=arg['workers'], fsync=arg['fsync'],
+                            retarget=Retarget(arg['interval']), scheme=arg['scheme'])
     # Decide whether to initialize the blockchain or read previous records
     if os.path.exists(data_path) and len(os.listdir(data_path)) != 0:
         print('You had create a blockchain!!!')
@@ -89,8 +101,8 @@ def execute_create_user(arg):
     username : str
         the name of the new user
     """
-    blockchain = Blockchain()
-    blockchain.read_blockchain()
+    blockchain = Blockchain(fsync=arg['fsync'])
+    blockchain.read_blockchain(headers=True)
 
     username = arg['username']
 
@@ -114,8 +126,8 @@ def execute_add_balance(arg):
     balance : int
         the amount of value to be added to the wallet
     """
-    blockchain = Blockchain()
-    blockchain.read_blockchain()
+    blockchain = Blockchain(fsync=arg['fsync'])
+    blockchain.read_blockchain(headers=True)
 
     address = arg['address']
     balance = arg['balance']
@@ -149,7 +161,7 @@ def execute_get_balance(arg):
         the wallet address
     """
     blockchain = Blockchain()
-    blockchain.read_blockchain()
+    blockchain.read_blockchain(lazy=True)
 
     address = arg['address']
 
@@ -187,9 +199,12 @@ def execute_send(arg):
 
     option : str
         the additional option for this transaction (only have 'force' now)
+
+    workers : int
+        the number of processes used to mine a block
     """
-    blockchain = Blockchain()
-    blockchain.read_blockchain()
+    blockchain = Blockchain(workers=arg['workers'], fsync=arg['fsync'])
+    blockchain.read_blockchain(headers=True)
 
     src = arg['src']
     dest = arg['dest']
@@ -221,7 +236,11 @@ def execute_send(arg):
         return
 
     for i in range(rep):
-        blockchain.add_transaction(src, dest, amount)
+        try:
+            blockchain.add_transaction(src, dest, amount)
+        except ValueError as e:
+            print(e)
+            return
         print('Add a transaction to the blockchain!!!\n')
 
     option = arg['option']
@@ -237,7 +256,7 @@ def execute_send(arg):
 def execute_print_chain(arg):
     """Print the whole blockchain"""
     blockchain = Blockchain()
-    blockchain.read_blockchain()
+    blockchain.read_blockchain(lazy=True)
     blockchain.print_blocks()
 
 
@@ -254,7 +273,7 @@ def execute_print_block(arg):
         the direction to print the blocks (only have 'front' and 'back')
     """
     blockchain = Blockchain()
-    blockchain.read_blockchain()
+    blockchain.read_blockchain(lazy=True)
 
     height = arg['height']
     direction = arg['direction']
@@ -268,5 +287,76 @@ def execute_print_block(arg):
     return
 
 
+@ execute.register('verifychain')
+def execute_verify_chain(arg):
+    """Read the whole blockchain, check the merkle hash and the PoW hash of every block and the signature of every record"""
+    # The signatures verified by the last run are remembered and not verified again
+    blockchain = Blockchain(workers=arg['workers'], persist_signatures=True)
+
+    try:
+        blockchain.read_blockchain(verify=True)
+    except ValueError as e:
+        print(e)
+        return
+
+    # The hash of a block must commit to its data and link to the block before it
+    invalid = blockchain.verify_chain_hashes()
+    if invalid:
+        for height in invalid:
+            print(f'Block {height} does not match its hash!!!')
+        return
+
+    # The signatures are checked as one batch over the worker processes
+    invalid = blockchain.verify_chain_signatures()
+    cache = blockchain.signature_cache
+    print(f'Signature cache: {cache.hits} hits, {cache.misses} misses!!!')
+    if invalid:
+        for height, index in invalid:
+            print(f'Transaction {index} of block {height} has an invalid signature!!!')
+        return
+
+    print(f'All {blockchain.size} blocks are valid!!!')
+
+
+@ execute.register('migrate')
+def execute_migrate(arg):
+    """Remove the duplicated transactions padded into the saved blocks by old versions
+
+    Parameters:
+    ----------
+    workers : int
+        the number of processes used to mine the rewritten blocks again
+    """
+    try:
+        count = strip_duplicate_transactions(os.getcwd() + '/data', arg['workers'])
+        print(f'Rewrote and mined {count} blocks again!!!')
+    except ValueError as e:
+        print(e)
+
+
+@ execute.register('convert')
+def execute_convert(arg):
+    """Convert the block storage of the blockchain
+
+    Parameters:
+    ----------
+    option : str
+        the storage to convert to ('segment', or 'json' and 'binary' for the block format of the segments)
+    """
+    option = arg['option'] or 'segment'
+
+    if option == 'segment':
+        count = convert_files_to_segments(os.getcwd() + '/data')
+        print(f'Moved {count} blocks into the segment store!!!')
+    elif option in ('json', 'binary'):
+        try:
+            count = convert_segments(os.getcwd() + '/data', option)
+            print(f'Converted {count} blocks into the {option} format!!!')
+        except ValueError as e:
+            print(e)
+    else:
+        print('The storage option is invalid!!!')
+
+
 if __name__ == '__main__':
     execute('error', dict())
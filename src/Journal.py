@@ -0,0 +1,183 @@
+# standard modules
+import os
+import json
+# my modules
+from Storage import StorageWriter
+
+
+class Journal:
+    """
+    A class for an append-only file of json entries, each line is one entry.
+
+    Every entry gets the next sequence number, so a snapshot taken at a sequence number
+    knows which entries it already holds. Lines written before the journal existed have
+    no sequence number and take the next one on replay. A torn last line left by a crash
+    is not an entry, it is ignored on replay and cut off before the next append.
+
+    The writes go through a StorageWriter, inside a batch they reach the file together with
+    the other writes of the operation, and a dropped batch puts the sequence number, the
+    number of entries and the end of the file back.
+
+    ...
+
+    Attributes:
+    ----------
+    path : str
+        the path of the journal file
+
+    seq : int
+        the sequence number of the last entry
+
+    size : int
+        the number of entries in the file
+
+    Methods:
+    ----------
+    replay(after) : Iterator[dict]
+        read the entries with a sequence number greater than after
+
+    append(entry) : int
+        append an entry and return its sequence number
+
+    reset() : None
+        empty the file, the sequence numbers go on
+
+    rewrite(entries) : None
+        replace the file at once with the given entries
+    """
+
+    def __init__(self, path, writer=None):
+        """
+        Parameters:
+        ----------
+        path : str
+            the path of the journal file
+
+        writer : StorageWriter
+            the writer of the journal, a writer without fsync if not given
+        """
+        self._path = path
+        self._writer = writer if writer is not None else StorageWriter()
+        self._seq = 0
+        self._size = 0
+        self._end = None
+
+    @property
+    def path(self):
+        """The path of the journal file"""
+        return self._path
+
+    @property
+    def seq(self):
+        """The sequence number of the last entry"""
+        return self._seq
+
+    @property
+    def size(self):
+        """The number of entries in the file"""
+        return self._size
+
+    def replay(self, after=0):
+        """Read the entries with a sequence number greater than after
+
+        Parameters:
+        ----------
+        after : int
+            the sequence number already held by the snapshot
+
+        Returns:
+        ----------
+        entries : Iterator[dict]
+            the entries in order
+        """
+        self._seq = after
+        self._size = 0
+        self._end = 0
+
+        if not os.path.exists(self._path):
+            return
+
+        with open(self._path, 'rb') as f:
+            for line in f:
+                # A line without its newline is torn
+                if not line.endswith(b'\n'):
+                    break
+
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                self._end += len(line)
+                self._size += 1
+
+                seq = entry.get('seq', self._seq + 1)
+                if seq > after:
+                    self._seq = seq
+                    yield entry
+
+    def append(self, entry):
+        """Append an entry
+
+        Parameters:
+        ----------
+        entry : dict
+            the json serializable entry, its 'seq' is set here
+
+        Returns:
+        ----------
+        seq : int
+            the sequence number of the entry
+        """
+        self._checkpoint()
+        entry['seq'] = self._seq + 1
+
+        # Cut off a torn line found by the replay
+        if self._end is not None and self._writer.size(self._path) > self._end:
+            self._writer.truncate(self._path, self._end)
+
+        self._writer.append(self._path, (json.dumps(entry) + '\n').encode())
+        self._end = self._writer.size(self._path)
+
+        self._seq += 1
+        self._size += 1
+
+        return self._seq
+
+    def reset(self):
+        """Empty the file, the sequence numbers go on"""
+        self._checkpoint()
+        self._writer.truncate(self._path)
+
+        self._size = 0
+        self._end = 0
+
+    def rewrite(self, entries):
+        """Replace the file at once with the given entries
+
+        Parameters:
+        ----------
+        entries : List[dict]
+            the json serializable entries, their 'seq' is set here
+        """
+        self._checkpoint()
+        lines = []
+        for entry in entries:
+            self._seq += 1
+            entry['seq'] = self._seq
+            lines.append((json.dumps(entry) + '\n').encode())
+
+        data = b''.join(lines)
+        self._writer.replace(self._path, data)
+
+        self._size = len(entries)
+        self._end = len(data)
+
+    def _checkpoint(self):
+        """Put the cursors back as they are now if the batch of the next write is dropped"""
+        seq, size, end = self._seq, self._size, self._end
+
+        def restore():
+            self._seq, self._size, self._end = seq, size, end
+
+        self._writer.on_abort(restore)
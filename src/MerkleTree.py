@@ -7,40 +7,94 @@ class MerkleTree:
     """
     A class used for promise the data integrity of all transactions in the block
 
+    Each level of the tree is kept as one flat bytearray of raw 32-byte digests, the
+    first level holds the hashes of the transaction pairs and the last level the root.
+    No object is created per node and only the root is base64 encoded.
+
+    Transactions can be appended one by one, only the path from the new transaction to
+    the root is hashed again, so a growing block template keeps its root up to date.
+
     ...
 
     Attributes
     ----------
-    root : MerkleNode
-        the root node of the merkle tree instance
+    root : bytes
+        the raw top hash of the merkle tree instance
+
+    levels : List[bytearray]
+        the concatenated raw digests of each level, from the transaction pairs to the root
+
+    leaves : List[str]
+        the transactions of the merkle tree
+
+    size : int
+        the number of transactions of the merkle tree
 
     Methods
     ----------
     hash() : str
         return the base64 encoded top hash of the merkle tree
 
+    get_proof(index) : List[list]
+        return the inclusion proof of the transaction at the index
+
+    append(tx) : None
+        add a transaction and update the path to the root
+
+    copy() : MerkleTree
+        return an independent copy of the merkle tree
+
     Static Methods
     ----------
     new_merkle_tree(arr) : MerkleTree
         construct a new MerkleTree instance with the given arr input
+
+    verify_proof(tx, proof, merkle_hash) : bool
+        check the inclusion proof of a transaction against a top hash
     """
 
-    def __init__(self, root):
+    def __init__(self, levels, leaves):
         """
-        Parameters: 
+        Parameters:
         ----------
-        root : MerkleNode
-            the root node of the merkle tree instance
+        levels : List[bytearray]
+            the concatenated raw digests of each level, from the transaction pairs to the root
+
+        leaves : List[str]
+            the transactions of the merkle tree
         """
-        self.root = root
+        self._levels = levels
+        self._leaves = leaves
 
     def __str__(self):
         """Return the top hash of the merkle tree"""
-        return self.hash()
+        return self.hash
 
     def __repr__(self):
         """Return the top hash of the merkle tree"""
-        return self.hash()
+        return self.hash
+
+    @property
+    def root(self):
+        """The raw top hash of the merkle tree, None if there is no transaction"""
+        if not self._levels:
+            return None
+        return bytes(self._levels[-1])
+
+    @property
+    def levels(self):
+        """The concatenated raw digests of each level"""
+        return self._levels
+
+    @property
+    def leaves(self):
+        """The transactions of the merkle tree"""
+        return self._leaves
+
+    @property
+    def size(self):
+        """The number of transactions of the merkle tree"""
+        return len(self._leaves)
 
     @property
     def hash(self):
@@ -48,125 +102,212 @@ class MerkleTree:
 
         Returns
         ----------
-        self.root.data : str 
-            return the base64 encoded top hash value
+        hash : str
+            return the base64 encoded top hash value, None if there is no transaction
         """
-        return self.root.data
+        if not self._levels:
+            return None
+        return base64.b64encode(self._levels[-1]).decode()
 
-    @staticmethod
-    def new_merkle_tree(arr):
-        """Construct a new MerkleTree instance with the given arr input
+    def append(self, tx):
+        """Add a transaction and update the path to the root
 
         Parameters
         ----------
-        arr : List[str]
-            a list of transactions strings
+        tx : str
+            the transaction string to be added
+        """
+        sha256 = hashlib.sha256
+        b64encode = base64.b64encode
+
+        leaves = self._leaves
+        leaves.append(tx)
+
+        # Hash the pair of the new transaction, it is paired with itself if it is the last odd one
+        index = (len(leaves) - 1) // 2
+        left = leaves[2 * index]
+        right = leaves[2 * index + 1] if 2 * index + 1 < len(leaves) else left
+        self._set_digest(0, index, sha256(left.encode() + right.encode()).digest())
+
+        # Hash the parents up to the level with a single digest, which is the root
+        depth = 0
+        while len(self._levels[depth]) > 32:
+            level = self._levels[depth]
+            index //= 2
+
+            left = level[index * 64:index * 64 + 32]
+            right = level[index * 64 + 32:index * 64 + 64] or left
+            self._set_digest(depth + 1, index,
+                             sha256(b64encode(left) + b64encode(right)).digest())
+
+            depth += 1
+
+    def copy(self):
+        """Return an independent copy of the merkle tree
 
         Returns
         ----------
-        merkle_tree : MerkleNode
-            the root node of the merkle tree instance
+        merkle_tree : MerkleTree
+            the copy, appending to it leaves this tree unchanged
         """
-        # The list for holding all nodes
-        nodes = []
+        return MerkleTree([bytearray(level) for level in self._levels], list(self._leaves))
 
-        # Duplicate the last transaction if the number of transactions is odd
-        if len(arr) % 2 != 0:
-            arr.append(arr[-1])
+    def _set_digest(self, depth, index, digest):
+        """Write a digest on a level, growing the level or the tree if needed
 
-        # Create a node for each transaction and add it into nodes
-        for i in range(len(arr)):
-            node = MerkleNode(None, None, arr[i])
-            nodes.append(node)
+        Parameters
+        ----------
+        depth : int
+            the level of the digest, 0 for the transaction pairs
 
-        # Iteratively build the merkle tree
-        for i in range(len(arr)):
-            # the list of the new higher level of nodes
-            new_level = []
+        index : int
+            the position of the digest on the level
 
-            # Break the loop if we left only one node
-            if len(nodes) == 1:
-                break
-            # Duplicate the last node if the number of nodes is odd
-            elif len(nodes) % 2 != 0:
-                nodes.append(nodes[-1])
+        digest : bytes
+            the raw 32-byte digest
+        """
+        if depth == len(self._levels):
+            self._levels.append(bytearray())
 
-            # Create a higher level node for for each two nodes
-            for j in range(0, len(nodes), 2):
-                # Compute the hash of the two nodes' data
-                m = hashlib.sha256()
-                m.update(nodes[j].data.encode())
-                m.update(nodes[j+1].data.encode())
-                hash = base64.b64encode(m.digest()).decode()
+        level = self._levels[depth]
+        level[index * 32:index * 32 + 32] = digest
 
-                # Create a new node and append to the nodes list
-                node = MerkleNode(nodes[j], nodes[j+1], hash)
-                new_level.append(node)
+    def get_proof(self, index):
+        """Return the inclusion proof of the transaction at the index
 
-            # Move to the next higher level of nodes
-            nodes = new_level
+        The proof is the sibling of each node on the path from the transaction to the root,
+        the transaction string paired with it on the first level and the base64 encoded
+        digests on the higher levels.
 
-        # Create a MerkleTree instance with its root node as the first node in nodes
-        merkle_tree = MerkleTree(nodes[0])
+        Parameters
+        ----------
+        index : int
+            the position of the transaction in the block
 
-        return merkle_tree
+        Returns
+        ----------
+        proof : List[list]
+            the ['left' or 'right', sibling] pairs from the bottom to the top
+        """
+        if index < 0 or index >= len(self._leaves):
+            raise IndexError(f'No transaction at index {index}!!!')
 
+        # The sibling transaction, an odd last transaction is paired with itself
+        sibling = index ^ 1
+        if sibling >= len(self._leaves):
+            sibling = index
+        proof = [['left' if index % 2 else 'right', self._leaves[sibling]]]
 
-class MerkleNode:
-    """
-    An internal class for the class MerkleTree
+        # The sibling digest on each level below the root
+        for level in self._levels[:-1]:
+            index //= 2
+            sibling = index ^ 1
+            if sibling * 32 >= len(level):
+                sibling = index
 
-    ...  
+            digest = level[sibling * 32:sibling * 32 + 32]
+            proof.append(['left' if index % 2 else 'right',
+                          base64.b64encode(digest).decode()])
 
-    Attributes:
-    ----------
-    left : MerkleNode
-        the left child node of this node
-    right : MerkleNode
-        the right child node of this node
-    data : str
-        the value of the node, which is a transaction in a block
-    """
+        return proof
+
+    @staticmethod
+    def verify_proof(tx, proof, merkle_hash):
+        """Check the inclusion proof of a transaction against a top hash
+
+        Parameters
+        ----------
+        tx : str
+            the transaction string
 
-    def __init__(self, left=None, right=None, data=None):
+        proof : List[list]
+            the proof returned by get_proof()
+
+        merkle_hash : str
+            the base64 encoded top hash, from the block header
+
+        Returns
+        ----------
+        result : bool
+            whether the transaction is included under the top hash
         """
-        Parameters:
+        # Hash the transaction with its sibling transaction
+        side, sibling = proof[0]
+        pair = sibling + tx if side == 'left' else tx + sibling
+        digest = hashlib.sha256(pair.encode()).digest()
+
+        # Hash the encoded digest with each sibling digest up to the root
+        for side, sibling in proof[1:]:
+            encoded = base64.b64encode(digest)
+            sibling = sibling.encode()
+            pair = sibling + encoded if side == 'left' else encoded + sibling
+            digest = hashlib.sha256(pair).digest()
+
+        return base64.b64encode(digest).decode() == merkle_hash
+
+    @staticmethod
+    def new_merkle_tree(arr):
+        """Construct a new MerkleTree instance with the given arr input
+
+        The first level hashes the pairs of transaction strings and the higher levels hash
+        the base64 encoded digests of the pairs below, the last element of an odd level is
+        paired with itself, so the root is the same as the one stored in existing blocks.
+
+        Parameters
+        ----------
+        arr : List[str]
+            a list of transactions strings, kept by the tree and never modified
+
+        Returns
         ----------
-        left : MerkleNode
-            the left child node of this node
-        right : MerkleNode
-            the right child node of this node
-        data : str
-            the value of the node, which is a transaction in a block
+        merkle_tree : MerkleTree
+            the merkle tree instance
         """
+        sha256 = hashlib.sha256
 
-        self._left = left
-        self._right = right
-        self._data = data
+        # An empty tree has no root until a transaction is appended
+        if not arr:
+            return MerkleTree([], arr)
 
-    @property
-    def left(self):
-        """The left child node of this node"""
-        return self._left
+        # Hash each pair of transactions into the first level, reading arr in place without
+        # copying or changing it, an odd last transaction is paired with itself
+        last = len(arr) - 1
+        level = bytearray(b''.join([sha256(arr[i].encode() + arr[min(i + 1, last)].encode()).digest()
+                                    for i in range(0, len(arr), 2)]))
+        levels = [level]
 
-    @left.setter
-    def left(self, left):
-        self._left = left
+        # Iteratively build the higher levels until only the root is left
+        while len(level) > 32:
+            # Encode the whole level at once and cut it into the 44 bytes base64 digests
+            encoded = _encode_level(level)
+            count = len(encoded) // 44
 
-    @property
-    def right(self):
-        """The right child node of this node"""
-        return self._right
+            # Duplicate the last digest if the number of digests is odd
+            if count % 2 != 0:
+                encoded += encoded[-44:]
+                count += 1
 
-    @right.setter
-    def right(self, right):
-        self._right = right
+            # Each parent hashes 88 contiguous bytes, the two encoded children
+            level = bytearray(b''.join([sha256(encoded[i:i + 88]).digest()
+                                        for i in range(0, count * 44, 88)]))
+            levels.append(level)
 
-    @property
-    def data(self):
-        """The data of this node"""
-        return self._data
+        return MerkleTree(levels, arr)
+
+
+def _encode_level(level):
+    """Base64 encode each 32-byte digest of a level
 
-    @data.setter
-    def data(self, data):
-        self._data = data
+    Parameters
+    ----------
+    level : bytearray
+        the concatenated raw digests
+
+    Returns
+    ----------
+    encoded : bytes
+        the concatenated 44 bytes base64 encoding of each digest
+    """
+    # 32 bytes is not a multiple of 3, so each digest has to be encoded on its own
+    b64encode = base64.b64encode
+    return b''.join([b64encode(level[i:i + 32]) for i in range(0, len(level), 32)])
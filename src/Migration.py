@@ -0,0 +1,198 @@
+# standard modules
+import os
+import json
+# my modules
+from Block import Block
+from BlockStore import BlockStore
+from Storage import StorageWriter
+
+
+def strip_duplicate_transactions(base_dir, workers=1):
+    """Remove the duplicated last transaction from the blocks saved in the data-* files
+
+    The merkle tree used to pad an odd transaction list by appending its last transaction
+    to the block itself, so those blocks were saved with an even number of transactions
+    ending in two identical records. The last record of a block is always a freshly signed
+    reward, so two identical last records can only come from that padding. The merkle hash
+    is unchanged, the padding is still done inside the tree.
+
+    The hash of a block was mined over its transactions and the hash of the block before
+    it, so a stripped block is mined again and so is every block after it, with its
+    previous hash linked to the new one. The rewritten files are swapped in by a single
+    logged batch, so an interrupted migration is redone as a whole and never leaves a
+    chain linked only up to some file.
+
+    Parameters:
+    ----------
+    base_dir : str
+        the blockchain directory holding the info and data directories
+
+    workers : int
+        the number of processes used to mine a block
+
+    Returns:
+    ----------
+    count : int
+        the number of rewritten blocks, running it again returns 0
+
+    Raises:
+    ----------
+    ValueError
+        if the blockchain uses the segment store, or a block does not link to the block
+        before it although nothing before it was rewritten
+    """
+    info_path = f'{base_dir}/info'
+    data_path = f'{base_dir}/data'
+
+    with open(f'{info_path}/metadata', 'r') as f:
+        metadata = json.loads(f.read().strip('\n'))
+
+    if metadata.get('storage', 'files') != 'files':
+        raise ValueError(
+            'The migration only applies to the blockchains saved in data-* files!!!')
+
+    # Finish the interrupted migration or operation first, its files are swapped in together
+    writer = StorageWriter(wal_path=f'{info_path}/wal')
+    writer.recover()
+
+    # The genesis block first, then the data files in the order of their numbers
+    files = sorted([file for file in os.listdir(data_path) if file.startswith('data-')],
+                   key=lambda file: int(file.split('-')[1]))
+    files = ['genesis'] + files
+
+    count = 0
+    prev_hash = None
+    rewritten = False
+
+    with writer.batch():
+        for file in files:
+            path = f'{data_path}/{file}'
+            lines = []
+            changed = False
+
+            with open(path, 'r') as f:
+                # Each line is a block
+                for line in f:
+                    line = line.strip('\n')
+                    if not line:
+                        continue
+
+                    data = json.loads(line)
+                    transactions = data['transactions']
+
+                    stripped = len(transactions) >= 2 and len(transactions) % 2 == 0 and transactions[-1] == transactions[-2]
+                    if stripped:
+                        transactions.pop()
+
+                    # Only a block rewritten in this run may have changed the previous hash
+                    relinked = prev_hash is not None and data['prev_hash'] != prev_hash
+                    if relinked and not rewritten:
+                        raise ValueError(
+                            f'Block {data["height"]} does not match the hash of the block before it!!!')
+
+                    # Mine the block again over its stripped transactions or its new previous hash
+                    if stripped or relinked:
+                        block = Block(data['height'] - 1, data['time'], data['bits'], 0, transactions,
+                                      data['prev_hash'] if prev_hash is None else prev_hash,
+                                      merkle_hash=data['merkle_hash'])
+                        block.mine(workers=workers)
+
+                        line = Block.serialize(block)
+                        data = json.loads(line)
+                        changed = True
+                        rewritten = True
+                        count += 1
+
+                    prev_hash = data['hash']
+                    lines.append(line)
+
+            if changed:
+                writer.replace(path, ''.join(line + '\n' for line in lines).encode())
+
+    return count
+
+
+def convert_files_to_segments(base_dir):
+    """Move the blocks from the genesis and data-* files into the segment store
+
+    The store is written first, then the metadata is switched to it and the old files are
+    removed last, a conversion interrupted before the switch is simply run again.
+
+    Parameters:
+    ----------
+    base_dir : str
+        the blockchain directory holding the info and data directories
+
+    Returns:
+    ----------
+    count : int
+        the number of converted blocks, 0 if the blockchain already uses the segment store
+    """
+    info_path = f'{base_dir}/info'
+    data_path = f'{base_dir}/data'
+
+    with open(f'{info_path}/metadata', 'r') as f:
+        metadata = json.loads(f.read().strip('\n'))
+
+    if metadata.get('storage', 'files') == 'segment':
+        return 0
+
+    # Start from an empty store in case a previous conversion was interrupted
+    for file in os.listdir(data_path):
+        if file in ('index', 'manifest', 'headers') or file.startswith('segment-'):
+            os.remove(f'{data_path}/{file}')
+
+    # The genesis block first, then the data files in the order of their numbers
+    files = sorted([file for file in os.listdir(data_path) if file.startswith('data-')],
+                   key=lambda file: int(file.split('-')[1]))
+    files = ['genesis'] + files
+
+    store = BlockStore(data_path)
+    for file in files:
+        with open(f'{data_path}/{file}', 'r') as f:
+            for line in f:
+                line = line.strip('\n')
+                if line:
+                    store.append(Block.deserialize(line))
+
+    # Switch the blockchain to the store
+    metadata['storage'] = 'segment'
+    with open(f'{info_path}/metadata.tmp', 'w') as f:
+        f.write(json.dumps(metadata) + '\n')
+    os.replace(f'{info_path}/metadata.tmp', f'{info_path}/metadata')
+
+    for file in files:
+        os.remove(f'{data_path}/{file}')
+
+    return store.size
+
+
+def convert_segments(base_dir, format):
+    """Rewrite the segment store of the blockchain in another block format
+
+    Parameters:
+    ----------
+    base_dir : str
+        the blockchain directory holding the info and data directories
+
+    format : str
+        the format to convert to, 'json' or 'binary'
+
+    Returns:
+    ----------
+    count : int
+        the number of converted blocks
+
+    Raises:
+    ----------
+    ValueError
+        if the blockchain does not use the segment store
+    """
+    with open(f'{base_dir}/info/metadata', 'r') as f:
+        metadata = json.loads(f.read().strip('\n'))
+
+    if metadata.get('storage', 'files') != 'segment':
+        raise ValueError(
+            'The blockchain has to be converted to the segment store first!!!')
+
+    return BlockStore(f'{base_dir}/data').convert(format)
@@ -3,7 +3,17 @@ import hashlib
 import json
 import base64
 import time
+import os
+import threading
+import multiprocessing
+from collections import deque
 from configparser import ConfigParser
+# my modules
+from Reporter import Reporter
+
+# The number of nonces tried between two checks of the mining loop
+CHUNK_SIZE = 1 << 14
+
 
 
 class PoW:
@@ -35,16 +45,31 @@ class PoW:
     data : str
         data_prefix + data, generated to compute the valid hash for the block
 
+    target : bytes
+        the largest valid hash as 32 big-endian bytes, compared with the raw digest directly
+
+    midstate : hashlib.sha256
+        the hash state after consuming data_prefix, copied for each nonce
+
     Methods:
     ---------- 
-    run() : int, str
+    run(reporter) : int, str
         compute and then return the nonce and the valid hash to the caller
 
+    run_parallel(workers, start, end, chunk_size, reporter) : int, str
+        split the nonce space across a pool of worker processes and return the first valid nonce and hash
+
+    mine(cursor, deadline, token, workers, reporter) : MiningResult
+        search until a valid nonce is found, the deadline passes or the token is cancelled
+
     prepare(nonce) : None
         prepared for candidate hash using the given nonce
 
     validate() : bool
         check if the computed hash is less than the threshold
+
+    check(nonce, hash) : bool
+        check a stored nonce and hash against the block data and the threshold
     """
 
     def __init__(self, block):
@@ -61,6 +86,9 @@ class PoW:
         # Set the target threshold
         self._threshold = 1 << (256 - block.bits)
 
+        # Raw digests compare against the target as big-endian bytes, no int conversion needed
+        self._target = (self._threshold - 1).to_bytes(32, 'big')
+
         # Read configuration
         # cfg = ConfigParser()
         # cfg.read('./config.txt')
@@ -71,7 +99,10 @@ class PoW:
 
         # Combined all data into one string
         self._data_prefix = str(block.height).encode() + str(block.time).encode() + str(block.bits).encode(
-        ) + self._txdata.encode() + block.prev_hash.encode() + block.merkle_tree.hash.encode()
+        ) + self._txdata.encode() + block.prev_hash.encode() + block.merkle_hash.encode()
+
+        # Hash the constant prefix only once, each nonce continues from a copy of this state
+        self._midstate = hashlib.sha256(self._data_prefix)
 
         # Other Attributes
         self._hash = None
@@ -105,9 +136,14 @@ class PoW:
     def data(self, data):
         self._data = data
 
-    def run(self):
+    def run(self, reporter=None):
         """Return the nonce and valid hash to the caller function
 
+        Parameters:
+        ----------
+        reporter : Reporter
+            the sink of the mining progress, silent if not given
+
         Returns:
         ----------
         nonce : int
@@ -116,20 +152,236 @@ class PoW:
         hash : str
             the base64 encoded valid hash
         """
-        nonce = 0
-        # Increment nonce by once after each loop until we find a valid one
-        while True:
-            # Generate hash and save it to self.hash
-            self._prepare_data(nonce)
+        result = self.mine(reporter=reporter)
+        return result.nonce, result.hash
+
+    def run_parallel(self, workers=None, start=0, end=None, chunk_size=CHUNK_SIZE, reporter=None):
+        """Search the nonce space with a pool of worker processes
+
+        The nonce space is cut into chunks which are handed out to the workers in order, and
+        the results are consumed in the same order, so the returned nonce is always the
+        smallest valid nonce in the range, exactly as run() would find it.
+
+        Parameters:
+        ----------
+        workers : int
+            the number of worker processes, default to the number of cpu cores
+
+        start : int
+            the first nonce to try
+
+        end : int
+            the nonce to stop at (exclusive), search forever if it is None
+
+        chunk_size : int
+            the number of nonces a worker tries in a single task
+
+        reporter : Reporter
+            the sink of the mining progress, silent if not given
+
+        Returns:
+        ----------
+        nonce : int
+            nonce to produce valid hash, None if no valid nonce in the range
+
+        hash : str
+            the base64 encoded valid hash, None if no valid nonce in the range
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        result, cursor = self._search(start, end, workers, chunk_size, reporter)
+        if result is None:
+            return None, None
+
+        return self._found(result)
+
+    def mine(self, cursor=0, deadline=None, token=None, workers=1, reporter=None):
+        """Search for a valid nonce until it is found, the deadline passes or the token is cancelled
+
+        Parameters:
+        ----------
+        cursor : int
+            the first nonce to try, the cursor of a previous unfinished result to resume it
+
+        deadline : float (unix timestamp)
+            the time to give up the search, search forever if it is None
+
+        token : CancelToken
+            the token to cancel the search from another thread
+
+        workers : int
+            the number of processes to search the nonce, more than one to mine in parallel
+
+        reporter : Reporter
+            the sink of the mining progress, silent if not given
+
+        Returns:
+        ----------
+        result : MiningResult
+            the found nonce and hash, or the cursor to resume the search
+        """
+        def should_stop():
+            # Checked between chunks, so the search stops within one chunk of nonces
+            if token is not None and token.cancelled:
+                return True
+            return deadline is not None and time.time() >= deadline
+
+        result, cursor = self._search(
+            cursor, None, workers, CHUNK_SIZE, reporter, should_stop)
+
+        if result is None:
+            return MiningResult(cursor=cursor)
+
+        nonce, hash = self._found(result)
+        return MiningResult(nonce, hash, cursor)
+
+    def _search(self, start, end, workers, chunk_size, reporter=None, should_stop=None):
+        """Scan the nonces chunk by chunk, in this process or in a pool of worker processes
+
+        Parameters:
+        ----------
+        start : int
+            the first nonce to try
+
+        end : int
+            the nonce to stop at (exclusive), search forever if it is None
+
+        workers : int
+            the number of processes, the search stays in this process if it is one
+
+        chunk_size : int
+            the number of nonces tried between two checks
+
+        reporter : Reporter
+            the sink of the mining progress, silent if not given
+
+        should_stop : function
+            called between chunks, the search gives up once it returns True
+
+        Returns:
+        ----------
+        result : tuple
+            (nonce, digest) of the smallest valid nonce, None if not found
+
+        cursor : int
+            every nonce before the cursor has been tried
+        """
+        if reporter is None:
+            reporter = Reporter()
+        reporter.start(self._block.bits)
+
+        if workers > 1:
+            result, cursor = self._search_parallel(
+                start, end, workers, chunk_size, reporter, should_stop)
+        else:
+            result, cursor = self._search_serial(
+                start, end, chunk_size, reporter, should_stop)
+
+        reporter.finish(cursor - start)
+        return result, cursor
+
+    def _search_serial(self, start, end, chunk_size, reporter, should_stop):
+        """Scan the nonces chunk by chunk in this process, see _search()"""
+        nonce = start
+        while end is None or nonce < end:
+            stop = nonce + chunk_size
+            if end is not None:
+                stop = min(stop, end)
+
+            result = _scan_nonces(self._midstate, self._target, nonce, stop)
+
+            # If the hash is valid, return the nonce and the raw digest
+            if result is not None:
+                return result, result[0] + 1
+
+            nonce = stop
+
+            # Report and check between chunks only, the scan itself does no I/O
+            reporter.update(nonce - start)
+            if should_stop is not None and should_stop():
+                break
+
+        return None, nonce
+
+    def _search_parallel(self, start, end, workers, chunk_size, reporter, should_stop):
+        """Scan the nonces with a pool of worker processes, see _search()"""
+        # Keep a few chunks in flight for each worker so no one stays idle
+        pending = deque()
+        next_start = start
+
+        with multiprocessing.Pool(workers) as pool:
+            while True:
+                # Hand out chunks until the window is full or the range is exhausted
+                while len(pending) < 2 * workers and (end is None or next_start < end):
+                    stop = next_start + chunk_size
+                    if end is not None:
+                        stop = min(stop, end)
+
+                    task = (self._data_prefix, self._target, next_start, stop)
+                    pending.append(
+                        (next_start, pool.apply_async(_search_nonces, (task,))))
+                    next_start = stop
+
+                # No valid nonce in the whole range
+                if not pending:
+                    return None, next_start
+
+                # Consume results in order, leaving the pool stops all other workers
+                result = pending.popleft()[1].get()
+                if result is not None:
+                    return result, result[0] + 1
+
+                # Every nonce before the next pending chunk has been tried
+                cursor = pending[0][0] if pending else next_start
+                reporter.update(cursor - start)
+                if should_stop is not None and should_stop():
+                    return None, cursor
+
+    def _found(self, result):
+        """Record a valid nonce and its digest
+
+        Parameters:
+        ----------
+        result : tuple
+            (nonce, digest) returned by the nonce scan
+
+        Returns:
+        ----------
+        nonce : int
+            nonce to produce valid hash
+
+        hash : str
+            the base64 encoded valid hash
+        """
+        nonce, digest = result
+        self._data = self._data_prefix + b'%d' % nonce
+        self._hash = int.from_bytes(digest, 'big')
+
+        # Using base64 encoding for storage
+        return nonce, base64.b64encode(digest).decode()
+
+    def check(self, nonce, hash):
+        """Check a stored nonce and hash against the block data and the threshold
 
-            # If the hash is valid, return the nonce and the base64 encoded hash
-            if self._validate():
-                # Using base64 encoding for storage
-                hash_data = base64.b64encode(
-                    self._hash.to_bytes(32, 'big')).decode()
-                return nonce, hash_data
+        Parameters:
+        ----------
+        nonce : int
+            the stored nonce of the block
+
+        hash : str
+            the stored base64 encoded hash of the block
+
+        Returns:
+        ----------
+        result : bool
+            whether the hash is the one of the block data with the nonce and is valid
+        """
+        m = self._midstate.copy()
+        m.update(b'%d' % nonce)
+        digest = m.digest()
 
-            nonce += 1
+        return base64.b64encode(digest).decode() == hash and digest <= self._target
 
     def _prepare_data(self, nonce):
         """
@@ -138,19 +390,13 @@ class PoW:
         nonce : int 
             the nonce for computing the hash value of this round
         """
-        self._data = self._data_prefix + str(nonce).encode()
+        self._data = self._data_prefix + b'%d' % nonce
 
-        # Generate the hash of the block
-        m = hashlib.sha256()
-        m.update(self._data)
+        # Generate the hash of the block from the prefix state
+        m = self._midstate.copy()
+        m.update(b'%d' % nonce)
         self._hash = int.from_bytes(m.digest(), 'big')
 
-        # Print the hash to the console
-        print_hash = base64.b64encode(
-            int.to_bytes(self.hash, 32, 'big')).decode()
-        print(
-            f'nonce = {nonce}, hash = {print_hash}', end='\r')
-
     def _validate(self):
         """Check if the computed hash is less than the threshold
 
@@ -162,3 +408,134 @@ class PoW:
             return True
         else:
             return False
+
+
+class MiningResult:
+    """
+    The result of a PoW.mine() call.
+
+    ...
+
+    Attributes:
+    ----------
+    found : bool
+        whether a valid nonce has been found
+
+    nonce : int
+        nonce to produce valid hash, None if not found
+
+    hash : str
+        the base64 encoded valid hash, None if not found
+
+    cursor : int
+        every nonce before the cursor has been tried, pass it back to mine() to resume
+    """
+
+    def __init__(self, nonce=None, hash=None, cursor=0):
+        self._nonce = nonce
+        self._hash = hash
+        self._cursor = cursor
+
+    @property
+    def found(self):
+        """Whether a valid nonce has been found"""
+        return self._nonce is not None
+
+    @property
+    def nonce(self):
+        """The valid nonce, None if not found"""
+        return self._nonce
+
+    @property
+    def hash(self):
+        """The base64 encoded valid hash, None if not found"""
+        return self._hash
+
+    @property
+    def cursor(self):
+        """The nonce to resume the search from"""
+        return self._cursor
+
+
+class CancelToken:
+    """
+    A token to cancel a running PoW.mine() call, safe to cancel from another thread.
+
+    ...
+
+    Attributes:
+    ----------
+    cancelled : bool
+        whether the token has been cancelled
+
+    Methods:
+    ----------
+    cancel() : None
+        ask the mining process to stop at the next check
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        """Whether the token has been cancelled"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """Ask the mining process to stop at the next check"""
+        self._event.set()
+
+
+def _search_nonces(task):
+    """Scan a range of nonces for a valid hash, executed in the worker processes
+
+    Parameters:
+    ----------
+    task : tuple
+        (data_prefix, target, start, end) of the range to be scanned
+
+    Returns:
+    ----------
+    result : tuple
+        (nonce, digest) of the first valid nonce in the range, None if not found
+    """
+    data_prefix, target, start, end = task
+
+    return _scan_nonces(hashlib.sha256(data_prefix), target, start, end)
+
+
+def _scan_nonces(midstate, target, start, end):
+    """The inner mining loop, try each nonce in [start, end) against the target
+
+    Parameters:
+    ----------
+    midstate : hashlib.sha256
+        the hash state after consuming the constant block data
+
+    target : bytes
+        the largest valid digest as 32 big-endian bytes
+
+    start : int
+        the first nonce to try
+
+    end : int
+        the nonce to stop at (exclusive)
+
+    Returns:
+    ----------
+    result : tuple
+        (nonce, digest) of the first valid nonce in the range, None if not found
+    """
+    # Bind the method once, the loop body only copies, hashes and compares
+    copy = midstate.copy
+
+    for nonce in range(start, end):
+        m = copy()
+        m.update(b'%d' % nonce)
+        digest = m.digest()
+
+        if digest <= target:
+            return nonce, digest
+
+    return None
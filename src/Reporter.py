@@ -0,0 +1,222 @@
+# standard modules
+import sys
+import time
+import logging
+
+
+class Reporter:
+    """
+    A class for reporting the mining progress, the base class reports nothing.
+
+    The mining loop only hands the number of tried nonces to update() between chunks,
+    the reporter decides whether the interval has passed and does all the output itself.
+
+    ...
+
+    Attributes:
+    ----------
+    interval : float
+        the minimal number of seconds between two reports
+
+    tried : int
+        the number of nonces tried so far
+
+    elapsed : float
+        the seconds since the mining started
+
+    hashrate : float
+        the number of nonces tried per second
+
+    eta : float
+        the estimated seconds until the expected number of tries for the bits is reached
+
+    Methods:
+    ----------
+    start(bits) : None
+        start timing a new mining process
+
+    update(tried) : None
+        record the progress and report it if the interval has passed
+
+    finish(tried) : None
+        record and report the final progress of the mining process
+
+    report(status, done) : None
+        output a status, overridden by the sinks
+    """
+
+    def __init__(self, interval=1.0):
+        """
+        Parameters:
+        ----------
+        interval : float
+            the minimal number of seconds between two reports
+        """
+        self._interval = interval
+        self._expected = 0
+        self._tried = 0
+        self._start = 0
+        self._last = 0
+
+    @property
+    def interval(self):
+        """The minimal number of seconds between two reports"""
+        return self._interval
+
+    @property
+    def tried(self):
+        """The number of nonces tried so far"""
+        return self._tried
+
+    @property
+    def elapsed(self):
+        """The seconds since the mining started"""
+        return time.monotonic() - self._start
+
+    @property
+    def hashrate(self):
+        """The number of nonces tried per second"""
+        elapsed = self.elapsed
+        return self._tried / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """The estimated seconds until the expected number of tries is reached"""
+        hashrate = self.hashrate
+        if hashrate == 0:
+            return None
+        return max(self._expected - self._tried, 0) / hashrate
+
+    def start(self, bits):
+        """Start timing a new mining process
+
+        Parameters:
+        ----------
+        bits : int
+            the hardness of the block, 2 ** bits tries are expected on average
+        """
+        self._expected = 1 << bits
+        self._tried = 0
+        self._start = time.monotonic()
+        self._last = self._start
+
+    def update(self, tried):
+        """Record the progress and report it if the interval has passed
+
+        Parameters:
+        ----------
+        tried : int
+            the number of nonces tried so far
+        """
+        self._tried = tried
+
+        now = time.monotonic()
+        if now - self._last >= self._interval:
+            self._last = now
+            self.report(self.status(), False)
+
+    def finish(self, tried):
+        """Record and report the final progress of the mining process
+
+        Parameters:
+        ----------
+        tried : int
+            the number of nonces tried in total
+        """
+        self._tried = tried
+        self.report(self.status(), True)
+
+    def status(self):
+        """Collect the current progress
+
+        Returns:
+        ----------
+        status : dict
+            the tried nonces, elapsed seconds, hashrate and eta
+        """
+        return {'tried': self._tried, 'elapsed': self.elapsed,
+                'hashrate': self.hashrate, 'eta': self.eta}
+
+    def report(self, status, done):
+        """Output a status, the base reporter is silent
+
+        Parameters:
+        ----------
+        status : dict
+            the status returned by status()
+
+        done : bool
+            whether the mining process has finished
+        """
+        pass
+
+
+class TTYReporter(Reporter):
+    """
+    A reporter which keeps rewriting a single status line on a terminal.
+    """
+
+    def __init__(self, interval=0.5, stream=None):
+        """
+        Parameters:
+        ----------
+        interval : float
+            the minimal number of seconds between two reports
+
+        stream : file
+            the terminal stream to write, default to stdout
+        """
+        super().__init__(interval)
+        self._stream = stream if stream is not None else sys.stdout
+        self._width = 0
+
+    def report(self, status, done):
+        """Rewrite the status line, and end the line when the mining finishes"""
+        eta = status['eta']
+        eta = f'{eta:.1f}s' if eta is not None else '-'
+
+        line = (f"tried = {status['tried']}, elapsed = {status['elapsed']:.1f}s, "
+                f"hashrate = {status['hashrate']:.0f} H/s, eta = {eta}")
+
+        # Pad with spaces to wipe a longer previous line
+        self._width = max(self._width, len(line))
+        self._stream.write('\r' + line.ljust(self._width) + ('\n' if done else ''))
+        self._stream.flush()
+
+
+class LogReporter(Reporter):
+    """
+    A reporter which emits a log record for each report, with the status attached as record.mining.
+    """
+
+    def __init__(self, interval=5.0, logger=None):
+        """
+        Parameters:
+        ----------
+        interval : float
+            the minimal number of seconds between two reports
+
+        logger : logging.Logger
+            the logger to emit records, default to the 'pseudoBitcoin.mining' logger
+        """
+        super().__init__(interval)
+        self._logger = logger if logger is not None else logging.getLogger(
+            'pseudoBitcoin.mining')
+
+    def report(self, status, done):
+        """Emit a log record with the status"""
+        self._logger.info('mining %s: tried=%d elapsed=%.1fs hashrate=%.0f', 'done' if done else 'progress',
+                          status['tried'], status['elapsed'], status['hashrate'], extra={'mining': status})
+
+
+def default_reporter():
+    """Choose the reporter for the command line
+
+    Returns:
+    ----------
+    reporter : Reporter
+        a status line on a terminal, otherwise silent so redirected output stays clean
+    """
+    if sys.stdout.isatty():
+        return TTYReporter()
+    return Reporter()
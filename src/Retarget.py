@@ -0,0 +1,218 @@
+# standard modules
+import math
+
+
+class Retarget:
+    """
+    A class for adjusting the PoW hardness to hold a target block interval.
+
+    Every window blocks, the time taken by the last window blocks is compared with the
+    target, and the bits are moved by log2 of the ratio since one more bit doubles the
+    expected number of tries. Between two retargets a block keeps the bits of its parent.
+
+    ...
+
+    Attributes:
+    ----------
+    interval : float
+        the target number of seconds between two blocks, retargeting is disabled if None
+
+    window : int
+        the number of blocks between two retargets, also the number of blocks measured
+
+    min_bits : int
+        the lowest hardness the retarget can reach
+
+    max_bits : int
+        the highest hardness the retarget can reach
+
+    max_step : int
+        the largest change of bits in a single retarget
+
+    enabled : bool
+        whether the retargeting is enabled
+
+    Methods:
+    ----------
+    next_bits(blocks, height) : int
+        the bits required for the block at the height on top of blocks
+
+    validate(blocks) : None
+        check the bits of each block follows the retarget rule
+
+    history(blocks) : List[list]
+        the [height, bits] pairs at which the bits changed
+
+    Static Methods:
+    ----------
+    serialize(retarget) : dict
+        transform the settings into a dictionary for the metadata
+
+    deserialize(data) : Retarget
+        create a Retarget instance from the metadata dictionary
+    """
+
+    def __init__(self, interval=None, window=10, min_bits=1, max_bits=32, max_step=2):
+        """
+        Parameters:
+        ----------
+        interval : float
+            the target number of seconds between two blocks, retargeting is disabled if None
+
+        window : int
+            the number of blocks between two retargets
+
+        min_bits : int
+            the lowest hardness the retarget can reach
+
+        max_bits : int
+            the highest hardness the retarget can reach
+
+        max_step : int
+            the largest change of bits in a single retarget
+        """
+        self._interval = interval
+        self._window = window
+        self._min_bits = min_bits
+        self._max_bits = max_bits
+        self._max_step = max_step
+
+    @property
+    def interval(self):
+        """The target number of seconds between two blocks"""
+        return self._interval
+
+    @property
+    def window(self):
+        """The number of blocks between two retargets"""
+        return self._window
+
+    @property
+    def min_bits(self):
+        """The lowest hardness the retarget can reach"""
+        return self._min_bits
+
+    @property
+    def max_bits(self):
+        """The highest hardness the retarget can reach"""
+        return self._max_bits
+
+    @property
+    def max_step(self):
+        """The largest change of bits in a single retarget"""
+        return self._max_step
+
+    @property
+    def enabled(self):
+        """Whether the retargeting is enabled"""
+        return self._interval is not None
+
+    def next_bits(self, blocks, height):
+        """Compute the bits required for a block
+
+        Parameters:
+        ----------
+        blocks : List[Block]
+            the blockchain, at least up to the parent of the block
+
+        height : int
+            the height of the block, must be greater than 0
+
+        Returns:
+        ----------
+        bits : int
+            the bits of the block at the height
+        """
+        prev_bits = blocks[height - 1].bits
+
+        # Keep the bits of the parent between two retargets
+        if not self.enabled or height % self._window != 0 or height <= self._window:
+            return prev_bits
+
+        # Measure the time taken by the last window blocks
+        span = blocks[height - 1].time - blocks[height - 1 - self._window].time
+        expected = self._interval * self._window
+
+        if span <= 0:
+            step = self._max_step
+        else:
+            step = round(math.log2(expected / span))
+            step = max(-self._max_step, min(self._max_step, step))
+
+        return max(self._min_bits, min(self._max_bits, prev_bits + step))
+
+    def validate(self, blocks):
+        """Check the bits of each block follows the retarget rule
+
+        Parameters:
+        ----------
+        blocks : List[Block]
+            the blockchain from the genesis block
+
+        Raises:
+        ----------
+        ValueError
+            if a block has different bits from the rule
+        """
+        for height in range(1, len(blocks)):
+            expected = self.next_bits(blocks, height)
+            if blocks[height].bits != expected:
+                raise ValueError(
+                    f'Block {height} has bits {blocks[height].bits}, the retarget rule requires {expected}!!!')
+
+    @staticmethod
+    def history(blocks):
+        """Collect the heights at which the bits changed
+
+        Parameters:
+        ----------
+        blocks : List[Block]
+            the blockchain from the genesis block
+
+        Returns:
+        ----------
+        history : List[list]
+            the [height, bits] pairs, starting with the genesis block
+        """
+        history = []
+        for block in blocks:
+            if not history or history[-1][1] != block.bits:
+                history.append([block.height, block.bits])
+
+        return history
+
+    @staticmethod
+    def serialize(retarget):
+        """Transform the settings into a dictionary for the metadata
+
+        Parameters:
+        ----------
+        retarget : Retarget
+            the retarget settings
+
+        Returns:
+        ----------
+        data : dict
+            the json serializable settings
+        """
+        return {'interval': retarget.interval, 'window': retarget.window, 'min_bits': retarget.min_bits,
+                'max_bits': retarget.max_bits, 'max_step': retarget.max_step}
+
+    @staticmethod
+    def deserialize(data):
+        """Create a Retarget instance from the metadata dictionary
+
+        Parameters:
+        ----------
+        data : dict
+            the settings returned by serialize(), retargeting is disabled if None
+
+        Returns:
+        ----------
+        retarget : Retarget
+            the retarget settings
+        """
+        if data is None:
+            return Retarget()
+
+        return Retarget(data['interval'], data['window'], data['min_bits'], data['max_bits'], data['max_step'])
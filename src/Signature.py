@@ -0,0 +1,183 @@
+# standard modules
+import hashlib
+# third-party ecdsa modules
+from ecdsa import SigningKey, VerifyingKey, NIST384p, NIST256p, SECP256k1, BadSignatureError
+
+# The scheme of new blockchains
+DEFAULT_SCHEME = 'ecdsa-secp256k1'
+
+# The scheme of blockchains and wallets saved before the scheme was recorded
+LEGACY_SCHEME = 'ecdsa-nist384p'
+
+
+class SignatureScheme:
+    """
+    A class for a signature scheme, an ECDSA curve with the hash of the signed message.
+
+    The keys made by a scheme carry its curve and hash, so they sign and verify without it.
+
+    ...
+
+    Attributes:
+    ----------
+    name : str
+        the id of the scheme recorded in the metadata and the wallet file
+
+    curve : ecdsa.curves.Curve
+        the curve of the keys
+
+    hashfunc : function
+        the hash of the signed message
+
+    Methods:
+    ----------
+    generate() : SigningKey
+        generate a new signing key
+
+    signing_key(raw) : SigningKey
+        decode a raw signing key
+
+    verifying_key(raw) : VerifyingKey
+        decode a raw verifying key
+
+    sign(sk, message) : bytes
+        sign the message
+
+    verify(vk, message, signature) : bool
+        check the signature of the message
+    """
+
+    def __init__(self, name, curve, hashfunc):
+        """
+        Parameters:
+        ----------
+        name : str
+            the id of the scheme
+
+        curve : ecdsa.curves.Curve
+            the curve of the keys
+
+        hashfunc : function
+            the hash of the signed message
+        """
+        self._name = name
+        self._curve = curve
+        self._hashfunc = hashfunc
+
+    @property
+    def name(self):
+        """The id of the scheme"""
+        return self._name
+
+    @property
+    def curve(self):
+        """The curve of the keys"""
+        return self._curve
+
+    @property
+    def hashfunc(self):
+        """The hash of the signed message"""
+        return self._hashfunc
+
+    def generate(self):
+        """Generate a new signing key"""
+        return SigningKey.generate(curve=self._curve, hashfunc=self._hashfunc)
+
+    def signing_key(self, raw):
+        """Decode a raw signing key
+
+        Parameters:
+        ----------
+        raw : bytes
+            the raw signing key
+
+        Returns:
+        ----------
+        sk : SigningKey
+            the signing key of the scheme
+        """
+        return SigningKey.from_string(raw, curve=self._curve, hashfunc=self._hashfunc)
+
+    def verifying_key(self, raw):
+        """Decode a raw verifying key
+
+        Parameters:
+        ----------
+        raw : bytes
+            the raw verifying key
+
+        Returns:
+        ----------
+        vk : VerifyingKey
+            the verifying key of the scheme
+        """
+        return VerifyingKey.from_string(raw, curve=self._curve, hashfunc=self._hashfunc)
+
+    def sign(self, sk, message):
+        """Sign the message
+
+        Parameters:
+        ----------
+        sk : SigningKey
+            the signing key of the scheme
+
+        message : bytes
+            the message to be signed
+
+        Returns:
+        ----------
+        signature : bytes
+            the raw signature
+        """
+        return sk.sign(message, hashfunc=self._hashfunc)
+
+    def verify(self, vk, message, signature):
+        """Check the signature of the message
+
+        Parameters:
+        ----------
+        vk : VerifyingKey
+            the verifying key of the scheme
+
+        message : bytes
+            the signed message
+
+        signature : bytes
+            the raw signature
+
+        Returns:
+        ----------
+        result : bool
+            whether the signature is valid
+        """
+        try:
+            return vk.verify(signature, message, hashfunc=self._hashfunc)
+        except BadSignatureError:
+            return False
+
+
+# The legacy scheme keeps the sha1 default of the ecdsa package, its saved signatures use it
+SCHEMES = {scheme.name: scheme for scheme in (
+    SignatureScheme('ecdsa-nist384p', NIST384p, hashlib.sha1),
+    SignatureScheme('ecdsa-nist256p', NIST256p, hashlib.sha256),
+    SignatureScheme('ecdsa-secp256k1', SECP256k1, hashlib.sha256),
+)}
+
+
+def get_scheme(name):
+    """Get the signature scheme of the id
+
+    Parameters:
+    ----------
+    name : str
+        the id of the scheme
+
+    Returns:
+    ----------
+    scheme : SignatureScheme
+        the signature scheme
+    """
+    if name not in SCHEMES:
+        raise ValueError(f'The signature scheme {name} is not supported!!!')
+
+    return SCHEMES[name]
@@ -0,0 +1,220 @@
+# standard modules
+import os
+import struct
+import hashlib
+from collections import OrderedDict
+# my modules
+from Storage import StorageWriter
+
+# The length of a key of the cache, a sha256 digest
+KEY_SIZE = 32
+
+
+class SignatureCache:
+    """
+    A class for a bounded cache of the signatures already known to be valid.
+
+    A signature is keyed by the sha256 of the signature scheme, the raw verifying key, the
+    message and the signature, so a record signed again, by another key or under another
+    scheme is a different entry. Only valid signatures are kept, a miss is verified again.
+    When the cache is full the least recently used signature is dropped.
+
+    With a path, the keys are saved to the file in the order of their use and read back
+    when the cache is loaded, so a restarted blockchain does not verify them again. The
+    saved keys are trusted like the rest of the blockchain data.
+
+    ...
+
+    Attributes:
+    ----------
+    capacity : int
+        the maximal number of signatures in the cache
+
+    path : str
+        the path of the file the cache is saved to, not saved if None
+
+    hits : int
+        the number of lookups of a signature in the cache
+
+    misses : int
+        the number of lookups of a signature not in the cache
+
+    size : int
+        the number of signatures in the cache
+
+    changed : bool
+        whether the cache has new signatures since it was loaded or saved
+
+    Methods:
+    ----------
+    contains(key) : bool
+        whether the signature is known to be valid, counted as a hit or a miss
+
+    add(key) : None
+        remember a valid signature
+
+    load() : int
+        read the saved signatures
+
+    save() : None
+        replace the saved signatures with the ones in the cache
+
+
+    Static Methods:
+    ----------
+    key(scheme, vk, message, signature) : bytes
+        the key of a signature
+    """
+
+    def __init__(self, capacity=4096, path=None, writer=None):
+        """
+        Parameters:
+        ----------
+        capacity : int
+            the maximal number of signatures in the cache
+
+        path : str
+            the path of the file the cache is saved to, not saved if None
+
+        writer : StorageWriter
+            the writer of the cache file, a writer without fsync if not given
+        """
+        if capacity <= 0:
+            raise ValueError('The capacity of the signature cache must be positive!!!')
+
+        self._capacity = capacity
+        self._path = path
+        self._writer = writer if writer is not None else StorageWriter()
+        self._keys = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._changed = False
+
+    @property
+    def capacity(self):
+        """The maximal number of signatures in the cache"""
+        return self._capacity
+
+    @property
+    def path(self):
+        """The path of the file the cache is saved to"""
+        return self._path
+
+    @property
+    def hits(self):
+        """The number of lookups of a signature in the cache"""
+        return self._hits
+
+    @property
+    def misses(self):
+        """The number of lookups of a signature not in the cache"""
+        return self._misses
+
+    @property
+    def size(self):
+        """The number of signatures in the cache"""
+        return len(self._keys)
+
+    @property
+    def changed(self):
+        """Whether the cache has new signatures since it was loaded or saved"""
+        return self._changed
+
+    @staticmethod
+    def key(scheme, vk, message, signature):
+        """The key of a signature
+
+        Parameters:
+        ----------
+        scheme : str
+            the id of the signature scheme, raw keys of two schemes may have the same bytes
+
+        vk : bytes
+            the raw verifying key of the signer
+
+        message : bytes
+            the signed message
+
+        signature : bytes
+            the raw signature
+
+        Returns:
+        ----------
+        key : bytes
+            the sha256 digest of the four, with their lengths so they cannot run into each other
+        """
+        scheme = scheme.encode()
+        return hashlib.sha256(struct.pack('>BHI', len(scheme), len(vk), len(message))
+                              + scheme + vk + message + signature).digest()
+
+    def contains(self, key):
+        """Whether the signature is known to be valid, counted as a hit or a miss
+
+        Parameters:
+        ----------
+        key : bytes
+            the key of the signature
+
+        Returns:
+        ----------
+        result : bool
+            whether the signature is in the cache
+        """
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            self._hits += 1
+            return True
+
+        self._misses += 1
+        return False
+
+    def add(self, key):
+        """Remember a valid signature
+
+        Parameters:
+        ----------
+        key : bytes
+            the key of the signature
+        """
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return
+
+        self._keys[key] = None
+        self._changed = True
+
+        # Drop the least recently used signature
+        if len(self._keys) > self._capacity:
+            self._keys.popitem(last=False)
+
+    def load(self):
+        """Read the saved signatures, the most recently used ones are kept if they are more than the capacity
+
+        Returns:
+        ----------
+        count : int
+            the number of signatures read
+        """
+        if self._path is None or not os.path.exists(self._path):
+            return 0
+
+        with open(self._path, 'rb') as f:
+            data = f.read()
+
+        # A torn last key is not a key
+        count = 0
+        for offset in range(0, len(data) - KEY_SIZE + 1, KEY_SIZE):
+            self.add(data[offset:offset + KEY_SIZE])
+            count += 1
+
+        self._changed = False
+
+        return count
+
+    def save(self):
+        """Replace the saved signatures with the ones in the cache, from the least recently used"""
+        if self._path is None:
+            return
+
+        self._writer.replace(self._path, b''.join(self._keys))
+        self._changed = False
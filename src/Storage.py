@@ -0,0 +1,436 @@
+# standard modules
+import os
+import json
+import time
+import base64
+import atexit
+import struct
+import hashlib
+import contextlib
+
+# The durability policies of the storage writer
+FSYNC_POLICIES = ('none', 'batch', 'interval')
+
+# magic, length and sha256 of the payload of the write-ahead log
+WAL_HEADER = struct.Struct('>6sQ32s')
+WAL_MAGIC = b'PBWAL1'
+
+
+class StorageWriter:
+    """
+    A class which groups the file writes of one logical operation into a single batch.
+
+    Inside batch() the appends, truncates and replaces are only queued. When the outermost
+    batch ends they are written file by file in the order the files were touched, the
+    appends to a file go out as one write, and a replace or an emptying truncate discards
+    what was queued for the file before it and moves the file after the ones touched so far,
+    so a snapshot still reaches the disk before the journal it compacts is emptied.
+    Outside a batch every write goes out at once as a batch of its own. A dropped batch runs
+    the abort hooks registered by the writers of the files, so the offsets and counts they
+    keep in memory go back to the files on disk.
+
+    With a write-ahead log, a batch of more than one write is first written to the log
+    with the offset each append expects to start at, and the log is removed once the
+    files are written. recover() redoes the logged batch left by a crash: an append whose
+    bytes are already in place is skipped and a partial one is cut back and written again,
+    so the batch ends up applied exactly once. A torn log means the files were not touched
+    yet and it is discarded.
+
+    The fsync policy decides the durability of a written batch:
+        none     - leave the data to the page cache of the operating system
+        batch    - fsync every written file before the batch returns
+        interval - fsync the written files once at least interval seconds have passed, and
+                   the files still not synced when the writer is closed or the process exits
+
+    ...
+
+    Attributes:
+    ----------
+    fsync : str
+        the fsync policy, 'none', 'batch' or 'interval'
+
+    interval : float
+        the minimal number of seconds between two fsyncs of the interval policy
+
+    wal_path : str
+        the path of the write-ahead log, batches are not logged if None
+
+    Methods:
+    ----------
+    batch() : context manager
+        queue the writes until the outermost batch ends
+
+    append(path, data) : None
+        append the bytes to the file
+
+    truncate(path, size) : None
+        cut the file to the size, creating it if needed
+
+    replace(path, data) : None
+        replace the content of the file at once
+
+    size(path) : int
+        the size of the file once the queued writes are done
+
+    read(path) : bytes
+        the content of the file once the queued writes are done
+
+    flush() : None
+        write the queued writes now
+
+    sync() : None
+        fsync the files written since the last fsync
+
+    recover() : bool
+        redo the batch logged before a crash
+
+    on_abort(hook) : None
+        call the hook if the open batch is dropped
+
+    close() : None
+        write the queued writes and fsync the files not synced yet
+    """
+
+    def __init__(self, fsync='none', interval=1.0, wal_path=None):
+        """
+        Parameters:
+        ----------
+        fsync : str
+            the fsync policy, 'none', 'batch' or 'interval'
+
+        interval : float
+            the minimal number of seconds between two fsyncs of the interval policy
+
+        wal_path : str
+            the path of the write-ahead log, batches are not logged if None
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'The fsync policy {fsync} is invalid!!!')
+
+        self._fsync = fsync
+        self._interval = interval
+        self._wal_path = wal_path
+        self._depth = 0
+        self._pending = dict()
+        self._aborts = []
+        self._dirty = set()
+        self._last_sync = time.monotonic()
+
+        # The last writes of the interval policy are synced on exit at the latest
+        if fsync == 'interval':
+            atexit.register(self.close)
+
+    @property
+    def fsync(self):
+        """The fsync policy"""
+        return self._fsync
+
+    @property
+    def interval(self):
+        """The minimal number of seconds between two fsyncs of the interval policy"""
+        return self._interval
+
+    @property
+    def wal_path(self):
+        """The path of the write-ahead log"""
+        return self._wal_path
+
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue the writes until the outermost batch ends
+
+        The queued writes are dropped if the operation raises, so the files keep the state
+        before the operation, and the abort hooks are called from the last registered one.
+        """
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self._pending = dict()
+                aborts = self._aborts
+                self._aborts = []
+                for hook in reversed(aborts):
+                    hook()
+            raise
+
+        self._depth -= 1
+        if self._depth == 0:
+            self.flush()
+
+    def append(self, path, data):
+        """Append the bytes to the file
+
+        Parameters:
+        ----------
+        path : str
+            the path of the file
+
+        data : bytes
+            the bytes to be appended
+        """
+        ops = self._pending.setdefault(path, [])
+
+        # Merge with the previous append to the file
+        if ops and ops[-1][0] == 'append':
+            ops[-1][1].extend(data)
+        else:
+            ops.append(['append', bytearray(data)])
+
+        self._write_now()
+
+    def truncate(self, path, size=0):
+        """Cut the file to the size, creating it if needed
+
+        Parameters:
+        ----------
+        path : str
+            the path of the file
+
+        size : int
+            the new size of the file
+        """
+        # Nothing queued before matters if the file is emptied
+        if size == 0:
+            self._pending.pop(path, None)
+
+        self._pending.setdefault(path, []).append(['truncate', size])
+
+        self._write_now()
+
+    def replace(self, path, data):
+        """Replace the content of the file at once, through a temporary file and a rename
+
+        Parameters:
+        ----------
+        path : str
+            the path of the file
+
+        data : bytes
+            the new content of the file
+        """
+        self._pending.pop(path, None)
+        self._pending[path] = [['replace', bytes(data)]]
+        self._write_now()
+
+    def size(self, path):
+        """The size of the file once the queued writes are done
+
+        Parameters:
+        ----------
+        path : str
+            the path of the file
+
+        Returns:
+        ----------
+        size : int
+            the size in bytes
+        """
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+
+        for op, arg in self._pending.get(path, []):
+            if op == 'append':
+                size += len(arg)
+            elif op == 'truncate':
+                size = arg
+            else:
+                size = len(arg)
+
+        return size
+
+    def read(self, path):
+        """The content of the file once the queued writes are done, the file is not touched
+
+        Parameters:
+        ----------
+        path : str
+            the path of the file
+
+        Returns:
+        ----------
+        data : bytes
+            the content of the file
+        """
+        data = bytearray()
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data.extend(f.read())
+
+        for op, arg in self._pending.get(path, []):
+            if op == 'append':
+                data.extend(arg)
+            elif op == 'truncate':
+                del data[arg:]
+                data.extend(bytes(arg - len(data)))
+            else:
+                data = bytearray(arg)
+
+        return bytes(data)
+
+    def on_abort(self, hook):
+        """Call the hook if the open batch is dropped, a write outside a batch is never dropped
+
+        Parameters:
+        ----------
+        hook : function
+            called without arguments to undo the in-memory changes made along the writes
+        """
+        if self._depth > 0:
+            self._aborts.append(hook)
+
+    def flush(self):
+        """Write the queued writes now, and fsync them as the policy requires"""
+        pending = self._pending
+        self._pending = dict()
+        self._aborts = []
+
+        # Flatten the writes with the offset each append expects to start at
+        records = []
+        for path, ops in pending.items():
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            for op, arg in ops:
+                records.append((path, op, arg, size))
+                if op == 'append':
+                    size += len(arg)
+                elif op == 'truncate':
+                    size = arg
+                else:
+                    size = len(arg)
+
+        # A single write is atomic or leaves a torn line the journals detect by themselves
+        logged = self._wal_path is not None and len(records) > 1
+        if logged:
+            self._write_wal(records)
+
+        self._apply(records)
+
+        if self._fsync == 'batch' or (self._fsync == 'interval' and time.monotonic() - self._last_sync >= self._interval):
+            self.sync()
+        elif self._fsync == 'none':
+            self._dirty.clear()
+
+        # The batch is in the files, the log is not needed anymore
+        if logged:
+            os.remove(self._wal_path)
+
+    def recover(self):
+        """Redo the batch logged before a crash
+
+        Returns:
+        ----------
+        result : bool
+            whether a logged batch has been redone, a torn log is discarded
+        """
+        if self._wal_path is None or not os.path.exists(self._wal_path):
+            return False
+
+        with open(self._wal_path, 'rb') as f:
+            data = f.read()
+
+        # The files are only written after the whole log, so a torn log changed nothing
+        records = None
+        if len(data) >= WAL_HEADER.size:
+            magic, length, checksum = WAL_HEADER.unpack_from(data)
+            payload = data[WAL_HEADER.size:WAL_HEADER.size + length]
+            if magic == WAL_MAGIC and len(payload) == length and hashlib.sha256(payload).digest() == checksum:
+                records = [(path, op, base64.b64decode(arg) if op != 'truncate' else arg, offset)
+                           for path, op, arg, offset in json.loads(payload)]
+
+        if records is not None:
+            self._apply(records, redo=True)
+            self.sync()
+
+        os.remove(self._wal_path)
+
+        return records is not None
+
+    def _write_wal(self, records):
+        """Write the batch to the write-ahead log before the files are touched
+
+        Parameters:
+        ----------
+        records : List[tuple]
+            the (path, op, argument, expected offset) of each write
+        """
+        payload = json.dumps([[path, op, base64.b64encode(arg).decode() if op != 'truncate' else arg, offset]
+                              for path, op, arg, offset in records]).encode()
+
+        with open(self._wal_path, 'wb') as f:
+            f.write(WAL_HEADER.pack(WAL_MAGIC, len(payload),
+                                    hashlib.sha256(payload).digest()))
+            f.write(payload)
+            if self._fsync != 'none':
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _apply(self, records, redo=False):
+        """Write the records to the files
+
+        Parameters:
+        ----------
+        records : List[tuple]
+            the (path, op, argument, expected offset) of each write
+
+        redo : bool
+            the records may be applied already, an append is only written where it is missing
+        """
+        for path, op, arg, offset in records:
+            if op == 'append':
+                with open(path, 'ab') as f:
+                    if redo:
+                        size = f.tell()
+                        if size >= offset + len(arg):
+                            continue
+                        if size < offset:
+                            raise ValueError(
+                                f'{path} is shorter than the logged batch expects!!!')
+                        # Cut a partial append back to where it started
+                        f.truncate(offset)
+                    f.write(arg)
+            elif op == 'truncate':
+                with open(path, 'ab') as f:
+                    f.truncate(arg)
+            else:
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(arg)
+                    if self._fsync != 'none':
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(path + '.tmp', path)
+
+            self._dirty.add(path)
+
+    def sync(self):
+        """Fsync the files written since the last fsync, and their directories"""
+        directories = set()
+        for path in self._dirty:
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    os.fsync(f.fileno())
+            directories.add(os.path.dirname(path))
+
+        # A rename or a new file is durable once its directory is
+        for directory in directories:
+            if not os.path.isdir(directory):
+                continue
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        self._dirty.clear()
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        """Write the queued writes and fsync the files not synced yet"""
+        if self._pending:
+            self.flush()
+        if self._dirty:
+            self.sync()
+
+    def _write_now(self):
+        """Flush at once when no batch is open"""
+        if self._depth == 0:
+            self.flush()
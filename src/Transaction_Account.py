@@ -1,8 +1,8 @@
 # standard modules
 import base58
 import json
-# third-party ecdsa modules
-from ecdsa import SigningKey, VerifyingKey, NIST384p
+# my modules
+from MerkleTree import MerkleTree
 
 
 class TransactionPool:
@@ -25,6 +25,12 @@ class TransactionPool:
     transactions : List[Transaction]
         the transactions list in the pool
 
+    version : int
+        increased on every change of the pool, used to tell whether a block template is stale
+
+    merkle_tree : MerkleTree
+        the merkle tree of the transaction records, updated as each transaction is added
+
     Methods:
     ----------
     add_transaction(transaction) : None
@@ -39,6 +45,8 @@ class TransactionPool:
 
     def __init__(self):
         self._transactions = list()
+        self._version = 0
+        self._merkle_tree = MerkleTree.new_merkle_tree([])
 
     @property
     def size(self):
@@ -60,6 +68,16 @@ class TransactionPool:
         """The transactions list in the pool"""
         return self._transactions
 
+    @property
+    def merkle_tree(self):
+        """The merkle tree of the transaction records"""
+        return self._merkle_tree
+
+    @property
+    def version(self):
+        """The number of changes made to the pool"""
+        return self._version
+
     def add_transaction(self, transaction):
         """Add a transaction into the pool
 
@@ -69,6 +87,8 @@ class TransactionPool:
             the transaction to be added to the pool
         """
         self._transactions.append(transaction)
+        self._merkle_tree.append(transaction.signed_record)
+        self._version += 1
 
     def pop_transaction(self, index):
         """Pop a transaction out of the pool at the given index
@@ -80,12 +100,16 @@ class TransactionPool:
         """
         if index >= 0 and index < len(self._transactions):
             self._transactions.pop(index)
+            self._merkle_tree = MerkleTree.new_merkle_tree(self.records)
+            self._version += 1
         else:
             print("Wrong index!")
 
     def reset(self):
         """Clear transactions in the pool"""
         self._transactions = []
+        self._merkle_tree = MerkleTree.new_merkle_tree([])
+        self._version += 1
 
 
 class Transaction:
@@ -119,10 +143,10 @@ class Transaction:
 
     Static Methods:
     ----------
-    sign(tx, sk) : str
+    sign(tx, sk, scheme) : str
         sign the transaction record
 
-    verify(tx, vk) : bool
+    verify(tx, vk, scheme) : bool
         verify the transaction record and signature
 
     serialize(tx) : str
@@ -184,7 +208,7 @@ class Transaction:
             return self.record
 
     @staticmethod
-    def sign(tx, sk):
+    def sign(tx, sk, scheme):
         """Sign a transaction and set the signature in a transaction
 
         Parameters:
@@ -195,18 +219,21 @@ class Transaction:
         sk : SigningKey
             the signing key (private key) of a wallet
 
+        scheme : SignatureScheme
+            the signature scheme of the key
+
         Returns:
         ----------
         signed_record : str
             the signed transaction record
         """
-        signature = base58.b58encode(sk.sign(tx.record.encode())).decode()
+        signature = base58.b58encode(scheme.sign(sk, tx.record.encode())).decode()
         tx.signature = signature
 
         return tx.signed_record
 
     @staticmethod
-    def verify(tx, vk):
+    def verify(tx, vk, scheme):
         """Verify the signature of a record
 
         Parameters:
@@ -217,17 +244,18 @@ class Transaction:
         vk : VerifyingKey
             the verifying key (public key) of a wallet
 
+        scheme : SignatureScheme
+            the signature scheme of the key
+
         Returns:
         ----------
         result : bool
             the result of whether the transaction is valid
         """
-        record, signature = sign_data.split('|')
-
-        record = record.encode()
-        signature = base58.b58decode(signature.encode())
+        record = tx.record.encode()
+        signature = base58.b58decode(tx.signature.encode())
 
-        return vk.verify(signature, record)
+        return scheme.verify(vk, record, signature)
 
     @staticmethod
     def serialize(tx):
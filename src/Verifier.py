@@ -0,0 +1,82 @@
+# standard modules
+import multiprocessing
+# third-party ecdsa modules
+from ecdsa import BadSignatureError
+# my modules
+from Signature import get_scheme
+
+# The number of signatures checked by a worker process per task
+CHUNK_SIZE = 64
+
+
+def verify_batch(items, scheme, workers=1, chunk_size=CHUNK_SIZE):
+    """Check a batch of ECDSA signatures, spread over a pool of processes
+
+    Parameters:
+    ----------
+    items : List[tuple]
+        the (raw verifying key, message, signature) triples, all bytes, a triple may be None
+        if its signer is unknown, it is then invalid
+
+    scheme : SignatureScheme
+        the signature scheme of the keys
+
+    workers : int
+        the number of processes, the signatures are checked in this process if it is 1
+
+    chunk_size : int
+        the number of signatures handed to a worker at once
+
+    Returns:
+    ----------
+    results : List[bool]
+        whether each signature is valid, in the order of items
+    """
+    chunks = [(scheme.name, items[i:i + chunk_size])
+              for i in range(0, len(items), chunk_size)]
+
+    if workers <= 1 or len(chunks) <= 1:
+        results = [_verify_chunk(chunk) for chunk in chunks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_verify_chunk, chunks)
+
+    return [result for chunk in results for result in chunk]
+
+
+def _verify_chunk(task):
+    """Check a chunk of signatures, the task of a worker process
+
+    Parameters:
+    ----------
+    task : tuple
+        the id of the signature scheme and the (raw verifying key, message, signature) triples
+
+    Returns:
+    ----------
+    results : List[bool]
+        whether each signature is valid
+    """
+    name, items = task
+    scheme = get_scheme(name)
+
+    # The records of a chain share a few keys, decode each of them once
+    keys = dict()
+    results = []
+    for item in items:
+        if item is None:
+            results.append(False)
+            continue
+
+        vk_bytes, message, signature = item
+        try:
+            vk = keys.get(vk_bytes)
+            if vk is None:
+                vk = scheme.verifying_key(vk_bytes)
+                keys[vk_bytes] = vk
+            results.append(scheme.verify(vk, message, signature))
+        except (BadSignatureError, ValueError, AssertionError):
+            results.append(False)
+
+    return results
+
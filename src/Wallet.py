@@ -3,15 +3,20 @@ import hashlib
 import json
 import base64
 import base58
-# third-party ecdsa modules
-from ecdsa import SigningKey, VerifyingKey, NIST384p
+from collections import OrderedDict
 from Crypto.Hash import RIPEMD160
+# my modules
+from Signature import DEFAULT_SCHEME, LEGACY_SCHEME, get_scheme
 
 
 class WalletPool:
     """
     A class for managing wallets in the blockchain.
 
+    Loaded wallets keep their raw key bytes, the ECDSA key objects are decoded on the first
+    get_wallet_signing_key or get_wallet_verifying_key call and kept in a bounded LRU cache,
+    so only the recently used accounts hold decoded keys.
+
     ...
 
     Attributes:
@@ -19,9 +24,15 @@ class WalletPool:
     wallets : List[Wallet]
         the wallets in the wallet pool
 
+    cache_size : int
+        the maximal number of decoded keys kept
+
     size : int 
         the number of wallets in the wallet pool
 
+    version : int
+        increased on every change of a wallet or a balance, used to tell whether a block template is stale
+
     Methods:
     ----------
     get_wallet(address) : Wallet
@@ -55,8 +66,17 @@ class WalletPool:
         get the verifying key of a wallet
     """
 
-    def __init__(self):
+    def __init__(self, cache_size=1024):
+        """
+        Parameters:
+        ----------
+        cache_size : int
+            the maximal number of decoded keys kept
+        """
         self._wallets = dict()
+        self._cache_size = cache_size
+        self._keys = OrderedDict()
+        self._version = 0
 
     @property
     def wallets(self):
@@ -69,6 +89,11 @@ class WalletPool:
         """
         return self._wallets.items()
 
+    @property
+    def cache_size(self):
+        """The maximal number of decoded keys kept"""
+        return self._cache_size
+
     @property
     def size(self):
         """The number of wallets in the wallet pool
@@ -80,6 +105,11 @@ class WalletPool:
         """
         return len(self._wallets.keys())
 
+    @property
+    def version(self):
+        """The number of changes of the wallets and their balances"""
+        return self._version
+
     def get_wallet(self, address):
         """Get the wallet of the given address
 
@@ -119,6 +149,8 @@ class WalletPool:
             the wallet to be added
         """
         self._wallets[wallet.address] = wallet
+        self._drop_keys(wallet.address)
+        self._version += 1
 
     def remove_address(self, address):
         """Remove a wallet based on the given address
@@ -133,6 +165,8 @@ class WalletPool:
         wallet : Wallet
             the removed wallet instance, return None if not found
         """
+        self._drop_keys(address)
+        self._version += 1
         return self._wallets.pop(address, None)
 
     def has_balance(self, address, amount):
@@ -152,6 +186,7 @@ class WalletPool:
         """
         wallet = self._wallets[address]
         wallet.add_balance(amount)
+        self._version += 1
 
     def sub_balance(self, address, amount):
         """Subtract amount of balance from a wallet
@@ -166,6 +201,7 @@ class WalletPool:
         """
         wallet = self._wallets[address]
         wallet.sub_balance(amount)
+        self._version += 1
 
     def wallet_balance(self, address):
         """Get the balance of a wallet
@@ -195,8 +231,7 @@ class WalletPool:
         sk : SigningKey
             the wallet signing key (private key)
         """
-        wallet = self._wallets[address]
-        return wallet.signing_key
+        return self._get_key(address, 'sk')
 
     def get_wallet_verifying_key(self, address):
         """Get the verifying key of a wallet
@@ -211,8 +246,45 @@ class WalletPool:
         vk : VerifyingKey
             the wallet verifying key (public key)
         """
+        return self._get_key(address, 'vk')
+
+    def _drop_keys(self, address):
+        """Remove the decoded keys of an address from the cache"""
+        self._keys.pop((address, 'sk'), None)
+        self._keys.pop((address, 'vk'), None)
+
+    def _get_key(self, address, kind):
+        """Get a decoded key from the LRU cache, decoding it on a miss
+
+        Parameters:
+        ----------
+        address : Wallet.address (str)
+            the wallet address
+
+        kind : str
+            'sk' for the signing key, 'vk' for the verifying key
+
+        Returns:
+        ----------
+        key : SigningKey or VerifyingKey
+            the decoded key
+        """
+        cache_key = (address, kind)
+        key = self._keys.get(cache_key)
+
+        if key is not None:
+            self._keys.move_to_end(cache_key)
+            return key
+
         wallet = self._wallets[address]
-        return wallet.verifying_key
+        key = wallet.signing_key if kind == 'sk' else wallet.verifying_key
+
+        # Drop the least recently used key if the cache is full
+        self._keys[cache_key] = key
+        if len(self._keys) > self._cache_size:
+            self._keys.popitem(last=False)
+
+        return key
 
 
 class Wallet:
@@ -235,9 +307,18 @@ class Wallet:
     vk : VerifyingKey
         the verifying key (public key) of the account
 
+    sk_bytes : bytes
+        the raw signing key
+
+    vk_bytes : bytes
+        the raw verifying key
+
     address : str
         the address of the wallet
 
+    scheme : str
+        the id of the signature scheme of the keys
+
     Methods: 
     ----------
     add_balance(amount) : None
@@ -259,7 +340,7 @@ class Wallet:
         transform a string back into a wallet
     """
 
-    def __init__(self, name, balance=0):
+    def __init__(self, name, balance=0, sk=None, vk=None, address=None, scheme=DEFAULT_SCHEME):
         """
         Parameters: 
         ----------
@@ -268,12 +349,26 @@ class Wallet:
 
         balance : int 
             the account balance
+
+        sk : SigningKey or bytes
+            the stored signing key of a persisted wallet, a new key is generated if not given,
+            raw bytes are only decoded when the key is used
+
+        vk : VerifyingKey or bytes
+            the stored verifying key, derived from the signing key if not given
+
+        address : str
+            the stored address, created from the verifying key if not given
+
+        scheme : str
+            the id of the signature scheme of the keys
         """
         self._name = name
         self._balance = balance
-        self.sk = SigningKey.generate(curve=NIST384p)
-        self.vk = self.sk.verifying_key
-        self._address = self._create_address()
+        self._scheme = get_scheme(scheme)
+        self._sk = sk if sk is not None else self._scheme.generate()
+        self._vk = vk if vk is not None else self.signing_key.verifying_key
+        self._address = address if address is not None else self._create_address()
 
     @property
     def name(self):
@@ -295,13 +390,54 @@ class Wallet:
 
     @property
     def signing_key(self):
-        """The signing key (private key) of the wallet"""
-        return self.sk
+        """The signing key (private key) of the wallet, raw bytes are decoded on each call"""
+        if isinstance(self._sk, bytes):
+            return self._scheme.signing_key(self._sk)
+        return self._sk
 
     @property
     def verifying_key(self):
+        """The verifying key (public key) of the wallet, raw bytes are decoded on each call"""
+        if isinstance(self._vk, bytes):
+            return self._scheme.verifying_key(self._vk)
+        return self._vk
+
+    @property
+    def sk(self):
+        """The signing key (private key) of the wallet"""
+        return self.signing_key
+
+    @sk.setter
+    def sk(self, sk):
+        self._sk = sk
+
+    @property
+    def vk(self):
         """The verifying key (public key) of the wallet"""
-        return self.vk
+        return self.verifying_key
+
+    @vk.setter
+    def vk(self, vk):
+        self._vk = vk
+
+    @property
+    def sk_bytes(self):
+        """The raw signing key"""
+        if isinstance(self._sk, bytes):
+            return self._sk
+        return self._sk.to_string()
+
+    @property
+    def vk_bytes(self):
+        """The raw verifying key"""
+        if isinstance(self._vk, bytes):
+            return self._vk
+        return self._vk.to_string()
+
+    @property
+    def scheme(self):
+        """The id of the signature scheme of the keys"""
+        return self._scheme.name
 
     @property
     def address(self):
@@ -344,7 +480,7 @@ class Wallet:
         # Initialize
         m = hashlib.sha256()
         h = RIPEMD160.new()
-        vk = base64.b64encode(self.verifying_key.to_string())
+        vk = base64.b64encode(self.vk_bytes)
 
         # Compute the hash of the wallet public key
         m.update(vk)
@@ -384,7 +520,7 @@ class Wallet:
         # Initialize
         m = hashlib.sha256()
         h = RIPEMD160.new()
-        vk = base64.b64encode(wallet.verifying_key.to_string())
+        vk = base64.b64encode(wallet.vk_bytes)
 
         # Create the sha256 hash of the wallet public key
         m.update(vk)
@@ -421,8 +557,8 @@ class Wallet:
             the serialized wallet data
         """
         # Creake a dictionary storing the information of the wallet
-        d = {'name': wallet.name, 'balance': wallet.balance, 'sk': base64.b64encode(wallet.signing_key.to_string(
-        )).decode(), 'vk': base64.b64encode(wallet.verifying_key.to_string()).decode(), 'address': wallet.address}
+        d = {'name': wallet.name, 'balance': wallet.balance, 'sk': base64.b64encode(wallet.sk_bytes).decode(),
+             'vk': base64.b64encode(wallet.vk_bytes).decode(), 'address': wallet.address, 'scheme': wallet.scheme}
 
         # Transform the dictionary into a string
         data = json.dumps(d)
@@ -446,12 +582,11 @@ class Wallet:
         # Process the raw data
         data = json.loads(raw_data)
 
-        # Create a wallet with the given data
-        wallet = Wallet(data['name'], data['balance'])
-        wallet.sk = SigningKey.from_string(
-            base64.b64decode(data['sk'].encode()), curve=NIST384p)
-        wallet.vk = VerifyingKey.from_string(
-            base64.b64decode(data['vk'].encode()), curve=NIST384p)
-        wallet.address = data['address']
+        # Create the wallet from the stored keys and address, no key is generated and the
+        # raw keys are only decoded when they are used, wallets saved without a scheme use the legacy one
+        sk = base64.b64decode(data['sk'].encode())
+        vk = base64.b64decode(data['vk'].encode())
+        wallet = Wallet(data['name'], data['balance'], sk, vk, data['address'],
+                        data.get('scheme', LEGACY_SCHEME))
 
         return wallet
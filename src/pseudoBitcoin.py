@@ -4,6 +4,7 @@ import os
 import click
 from Blockchain import Blockchain
 from Command import execute
+from Signature import SCHEMES, DEFAULT_SCHEME
 
 
 @click.command()
@@ -19,7 +20,11 @@ from Command import execute
 @click.option('-amount', 'amount', type=int, help='transaction value')
 @click.option('-o', '--option', 'option', type=str, help='The option for several commands, force: fire transactions')
 @click.option('-r', '--repetition', 'rep', type=int, help='How many times to send a same transaction')
-def main(cmd, name, address, username, balance, height, direction, src, dest, amount, option, rep):
+@click.option('-w', '--workers', 'workers', type=int, default=1, help='The number of processes used to mine a block')
+@click.option('-i', '--interval', 'interval', type=float, help='The target seconds between blocks, retarget the hardness to hold it')
+@click.option('-f', '--fsync', 'fsync', type=click.Choice(['none', 'batch', 'interval']), default='none', help='When to fsync the written data, after each operation (batch) or at most once per second (interval)')
+@click.option('-s', '--scheme', 'scheme', type=click.Choice(list(SCHEMES)), default=DEFAULT_SCHEME, help='The signature scheme of a new blockchain')
+def main(cmd, name, address, username, balance, height, direction, src, dest, amount, option, rep, workers, interval, fsync, scheme):
     path = os.getcwd() + '/data'
     info_path = path + '/info'
     data_path = path + '/data'
@@ -37,7 +42,11 @@ def main(cmd, name, address, username, balance, height, direction, src, dest, am
            'dest': dest,
            'amount': amount,
            'rep': rep,
-           'option': option}
+           'option': option,
+           'workers': workers,
+           'interval': interval,
+           'fsync': fsync,
+           'scheme': scheme}
 
     try:
         execute(arg)
@@ -0,0 +1,28 @@
+# standard modules
+import os
+import sys
+# third-party modules
+import pytest
+
+# The modules import each other by name from the src directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+
+@pytest.fixture
+def chain_dir(tmp_path, monkeypatch):
+    """An empty project directory as the working directory, the blockchain is saved under its data folder"""
+    (tmp_path / 'data').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def blockchain(chain_dir):
+    """A blockchain with a root account and a second account, mined at a low hardness"""
+    from Blockchain import Blockchain
+
+    chain = Blockchain(bits=4)
+    root = chain.initialize('root')
+    user = chain.create_user('user')
+
+    return chain, root.address, user.address
@@ -0,0 +1,85 @@
+# standard modules
+import json
+# my modules
+from Blockchain import Blockchain, WALLET_COMPACT_INTERVAL
+from Journal import Journal
+
+
+def test_replay_returns_the_entries_after_the_snapshot(tmp_path):
+    journal = Journal(str(tmp_path / 'journal'))
+    for i in range(5):
+        journal.append({'value': i})
+
+    replayed = Journal(str(tmp_path / 'journal'))
+    entries = list(replayed.replay(after=2))
+
+    assert [entry['value'] for entry in entries] == [2, 3, 4]
+    assert [entry['seq'] for entry in entries] == [3, 4, 5]
+    assert replayed.seq == 5
+    assert replayed.size == 5
+
+
+def test_torn_last_line_is_ignored_and_cut_before_the_next_append(tmp_path):
+    path = tmp_path / 'journal'
+    journal = Journal(str(path))
+    journal.append({'value': 0})
+    journal.append({'value': 1})
+
+    # A crash in the middle of an append leaves a line without its newline
+    with open(path, 'ab') as f:
+        f.write(b'{"value": 2, "se')
+
+    replayed = Journal(str(path))
+    assert [entry['value'] for entry in replayed.replay()] == [0, 1]
+
+    replayed.append({'value': 3})
+    lines = path.read_bytes().splitlines()
+    assert [json.loads(line)['value'] for line in lines] == [0, 1, 3]
+    assert json.loads(lines[-1])['seq'] == 3
+
+
+def test_lines_without_sequence_numbers_follow_the_snapshot(tmp_path):
+    path = tmp_path / 'journal'
+    path.write_text('{"value": 0}\n{"value": 1}\n')
+
+    # Lines written before the journal existed are never held by a snapshot
+    journal = Journal(str(path))
+    assert [entry['value'] for entry in journal.replay(after=4)] == [0, 1]
+    assert journal.seq == 6
+
+    assert journal.append({'value': 2}) == 7
+
+
+def test_reset_keeps_the_sequence_numbers(tmp_path):
+    journal = Journal(str(tmp_path / 'journal'))
+    journal.append({'value': 0})
+    journal.reset()
+
+    assert journal.size == 0
+    assert journal.append({'value': 1}) == 2
+
+
+def test_balance_changes_compact_the_wallet_journal(blockchain):
+    chain, root, user = blockchain
+
+    # No block is mined, only the balance changes write to the journal
+    for _ in range(WALLET_COMPACT_INTERVAL * 2):
+        chain.increment_balance(user, 1)
+        assert chain._wallet_journal.size < WALLET_COMPACT_INTERVAL
+
+    restarted = Blockchain(bits=4)
+    restarted.read_blockchain()
+
+    assert restarted.get_balance(user) == WALLET_COMPACT_INTERVAL * 2
+    assert restarted._wallet_journal.size < WALLET_COMPACT_INTERVAL
+
+
+def test_new_users_compact_the_wallet_journal(blockchain):
+    chain, root, user = blockchain
+
+    addresses = [chain.create_user(f'user {i}').address for i in range(WALLET_COMPACT_INTERVAL)]
+    assert chain._wallet_journal.size < WALLET_COMPACT_INTERVAL
+
+    restarted = Blockchain(bits=4)
+    restarted.read_blockchain()
+    assert all(restarted._wallet_pool.has_address(address) for address in addresses)
@@ -0,0 +1,64 @@
+# third-party modules
+import pytest
+# my modules
+from Benchmark import _node_merkle_tree
+from MerkleTree import MerkleTree
+
+# Odd and even sizes on every level, up to a few levels deep
+SIZES = list(range(1, 18)) + [31, 32, 33, 100]
+
+
+def transactions(count):
+    return [f'from: a -- to: b -- amount: {i}|signature {i}' for i in range(count)]
+
+
+@pytest.mark.parametrize('count', SIZES)
+def test_root_matches_the_node_tree(count):
+    txs = transactions(count)
+    assert MerkleTree.new_merkle_tree(txs).hash == _node_merkle_tree(txs)._data
+
+
+@pytest.mark.parametrize('count', SIZES)
+def test_appended_tree_matches_the_built_tree(count):
+    txs = transactions(count)
+    tree = MerkleTree.new_merkle_tree([])
+    for tx in txs:
+        tree.append(tx)
+
+    built = MerkleTree.new_merkle_tree(txs)
+    assert tree.hash == built.hash
+    assert tree.levels == built.levels
+    assert tree.leaves == txs
+
+
+@pytest.mark.parametrize('count', SIZES)
+def test_every_proof_verifies_against_the_node_tree_root(count):
+    txs = transactions(count)
+    tree = MerkleTree.new_merkle_tree(txs)
+    root = _node_merkle_tree(txs)._data
+
+    for index, tx in enumerate(txs):
+        proof = tree.get_proof(index)
+        assert MerkleTree.verify_proof(tx, proof, root)
+        assert not MerkleTree.verify_proof(tx + ' ', proof, root)
+
+
+def test_proof_of_another_position_does_not_verify():
+    txs = transactions(5)
+    tree = MerkleTree.new_merkle_tree(txs)
+
+    assert not MerkleTree.verify_proof(txs[0], tree.get_proof(3), tree.hash)
+
+    with pytest.raises(IndexError):
+        tree.get_proof(5)
+
+
+def test_copy_is_independent():
+    txs = transactions(3)
+    tree = MerkleTree.new_merkle_tree(txs)
+    copy = tree.copy()
+    copy.append('reward')
+
+    assert tree.hash == _node_merkle_tree(txs)._data
+    assert copy.hash == _node_merkle_tree(txs + ['reward'])._data
+    assert txs == transactions(3)
@@ -0,0 +1,115 @@
+# standard modules
+import os
+import json
+# third-party modules
+import pytest
+# my modules
+from Block import Block
+from Blockchain import Blockchain
+from Migration import strip_duplicate_transactions
+
+
+def block_files(data_path):
+    """The genesis and data-* files in the order of their blocks"""
+    files = sorted([file for file in os.listdir(data_path) if file.startswith('data-')],
+                   key=lambda file: int(file.split('-')[1]))
+    return [f'{data_path}/{file}' for file in ['genesis'] + files]
+
+
+def rewrite_blocks(data_path, change):
+    """Apply the change to the json of every block and mine the changed blocks again, as an old version saved them"""
+    prev_hash = None
+    for path in block_files(data_path):
+        with open(path, 'r') as f:
+            lines = [line.strip('\n') for line in f if line.strip('\n')]
+
+        for i, line in enumerate(lines):
+            data = json.loads(line)
+            change(data)
+            block = Block(data['height'] - 1, data['time'], data['bits'], 0, data['transactions'],
+                          data['prev_hash'] if prev_hash is None else prev_hash,
+                          merkle_hash=data['merkle_hash'])
+            block.mine()
+            lines[i] = Block.serialize(block)
+            prev_hash = block.hash
+
+        with open(path, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+
+def pad(data):
+    """Append the last transaction of a block with an odd number of transactions, like the old merkle tree"""
+    if len(data['transactions']) % 2 == 1:
+        data['transactions'].append(data['transactions'][-1])
+
+
+@pytest.fixture
+def padded_chain(chain_dir):
+    """A blockchain in data-* files with the blocks padded by the old merkle tree"""
+    chain = Blockchain(bits=4, storage='files')
+    root = chain.initialize('root').address
+    user = chain.create_user('user').address
+    chain.increment_balance(root, 10)
+
+    chain.add_transaction(root, user, 3)
+    chain.fire_transactions(root)
+    chain.add_transaction(root, user, 2)
+    chain.add_transaction(root, user, 1)
+    chain.fire_transactions(root)
+
+    rewrite_blocks(str(chain_dir / 'data' / 'data'), pad)
+    return chain_dir, user
+
+
+def read_files(data_path):
+    """The content of the block files"""
+    return [open(path).read() for path in block_files(f'{data_path}/data')]
+
+
+def test_migration_strips_the_padding_and_mines_the_blocks_again(padded_chain):
+    base_dir, user = padded_chain
+
+    # The genesis and the last block were padded, the block between them is linked again
+    assert strip_duplicate_transactions(str(base_dir / 'data')) == 3
+
+    chain = Blockchain()
+    chain.read_blockchain()
+    assert [len(block.transactions) for block in chain.blocks] == [1, 2, 3]
+    assert chain.verify_chain_hashes() == []
+    assert all(chain.verify_merkle_hash(block) for block in chain.blocks)
+    assert chain.get_balance(user) == 6
+
+
+def test_migration_run_again_changes_nothing(padded_chain):
+    base_dir, user = padded_chain
+    strip_duplicate_transactions(str(base_dir / 'data'))
+    files = read_files(base_dir / 'data')
+
+    assert strip_duplicate_transactions(str(base_dir / 'data')) == 0
+    assert read_files(base_dir / 'data') == files
+
+
+def test_unlinked_block_is_not_mined_again(padded_chain):
+    base_dir, user = padded_chain
+    strip_duplicate_transactions(str(base_dir / 'data'))
+    files = read_files(base_dir / 'data')
+
+    # Point the last block at another previous block, nothing before it is rewritten
+    path = block_files(str(base_dir / 'data' / 'data'))[-1]
+    with open(path, 'r') as f:
+        lines = f.read().splitlines()
+    data = json.loads(lines[-1])
+    data['prev_hash'] = data['hash']
+    lines[-1] = json.dumps(data)
+    with open(path, 'w') as f:
+        f.write(''.join(line + '\n' for line in lines))
+    files[-1] = open(path).read()
+
+    with pytest.raises(ValueError, match=f'Block {data["height"]} '):
+        strip_duplicate_transactions(str(base_dir / 'data'))
+    assert read_files(base_dir / 'data') == files
+
+
+def test_migration_refuses_the_segment_store(blockchain, chain_dir):
+    with pytest.raises(ValueError, match='data-\\* files'):
+        strip_duplicate_transactions(str(chain_dir / 'data'))
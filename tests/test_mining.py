@@ -0,0 +1,60 @@
+# third-party modules
+import pytest
+# my modules
+from PoW import CancelToken
+
+
+@pytest.fixture
+def hard_blockchain(blockchain, monkeypatch):
+    """The blockchain fixture with blocks too hard to be found in the first chunk of nonces"""
+    chain, root, user = blockchain
+    monkeypatch.setattr(chain._retarget, 'next_bits', lambda blocks, height: 64)
+    return blockchain
+
+
+def cancelled():
+    """A token that stops mining after the first chunk of nonces"""
+    token = CancelToken()
+    token.cancel()
+    return token
+
+
+def test_interrupted_block_resumes_from_its_template(hard_blockchain):
+    chain, root, user = hard_blockchain
+    chain.increment_balance(root, 5)
+    chain.add_transaction(root, user, 5)
+
+    assert not chain.fire_transactions(root, token=cancelled())
+    template = chain._template
+    cursor = template['cursor']
+
+    assert not chain.fire_transactions(root, token=cancelled())
+    assert chain._template is template
+    assert template['cursor'] > cursor
+
+
+def test_new_transaction_rebuilds_the_template(hard_blockchain):
+    chain, root, user = hard_blockchain
+    chain.increment_balance(root, 10)
+    chain.add_transaction(root, user, 5)
+
+    assert not chain.fire_transactions(root, token=cancelled())
+    chain.add_transaction(root, user, 5)
+
+    assert not chain.fire_transactions(root, token=cancelled())
+    assert chain._template['moves'] == [(root, user, 5), (root, user, 5)]
+
+
+def test_balance_change_outside_the_pool_rebuilds_the_template(hard_blockchain):
+    chain, root, user = hard_blockchain
+    chain.increment_balance(user, 5)
+    chain.add_transaction(user, root, 5)
+
+    assert not chain.fire_transactions(root, token=cancelled())
+    assert chain._template['moves'] == [(user, root, 5)]
+
+    # The transaction selected by the template can no longer be paid
+    chain.decrement_balance(user, 5)
+
+    assert not chain.fire_transactions(root, token=cancelled())
+    assert chain._template['moves'] == []
@@ -0,0 +1,59 @@
+# standard modules
+from collections import namedtuple
+# third-party modules
+import pytest
+# my modules
+from Retarget import Retarget
+
+Header = namedtuple('Header', ['height', 'time', 'bits'])
+
+
+def chain(spacing, count=21, bits=10):
+    """Blocks with the same bits mined spacing seconds apart"""
+    return [Header(height, height * spacing, bits) for height in range(count)]
+
+
+def test_bits_stay_between_retargets_and_when_disabled():
+    blocks = chain(100.0)
+    assert Retarget().next_bits(blocks, 20) == 10
+    assert Retarget(interval=1.0).next_bits(blocks, 19) == 10
+
+    # The first window has no window before it to be measured against
+    assert Retarget(interval=1.0).next_bits(blocks, 10) == 10
+
+
+@pytest.mark.parametrize('spacing, bits', [
+    (1.0, 10),      # on target
+    (0.5, 11),      # twice too fast
+    (2.0, 9),       # twice too slow
+    (0.01, 12),     # far too fast, clamped to max_step
+    (100.0, 8),     # far too slow, clamped to max_step
+    (0.0, 12),      # no time passed
+])
+def test_step_follows_log2_of_the_time_ratio(spacing, bits):
+    assert Retarget(interval=1.0).next_bits(chain(spacing), 20) == bits
+
+
+def test_bits_are_clamped_to_the_bounds():
+    assert Retarget(interval=1.0, max_bits=11).next_bits(chain(0.01), 20) == 11
+    assert Retarget(interval=1.0, min_bits=9).next_bits(chain(100.0), 20) == 9
+    assert Retarget(interval=1.0, min_bits=1).next_bits(chain(100.0, bits=2), 20) == 1
+
+
+def test_validate_names_the_block_breaking_the_rule():
+    retarget = Retarget(interval=1.0)
+    blocks = chain(0.5, count=22)
+    blocks[20] = blocks[20]._replace(bits=11)
+    blocks[21] = blocks[21]._replace(bits=11)
+    retarget.validate(blocks)
+
+    blocks[21] = blocks[21]._replace(bits=12)
+    with pytest.raises(ValueError, match='Block 21 '):
+        retarget.validate(blocks)
+
+
+def test_settings_survive_the_metadata():
+    retarget = Retarget(interval=2.5, window=5, min_bits=3, max_bits=20, max_step=1)
+    restored = Retarget.deserialize(Retarget.serialize(retarget))
+    assert Retarget.serialize(restored) == Retarget.serialize(retarget)
+    assert not Retarget.deserialize(None).enabled
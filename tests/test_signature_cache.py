@@ -0,0 +1,64 @@
+# third-party modules
+import pytest
+# my modules
+from Blockchain import Blockchain
+from SignatureCache import SignatureCache
+
+
+def test_admission_verifies_and_caches_the_record(blockchain):
+    chain, root, user = blockchain
+    cache = chain.signature_cache
+    misses = cache.misses
+
+    chain.add_transaction(root, user, 1)
+    assert cache.misses == misses + 1
+
+    # The record is verified again when it is checked for a block, now from the cache
+    record = chain._transaction_pool.records[-1]
+    assert chain._verify_transaction(root, record)
+    assert chain.verify_pending_signatures() == [True]
+    assert cache.hits == 2
+    assert cache.misses == misses + 1
+
+
+def test_admission_rejects_an_unknown_source(blockchain):
+    chain, root, user = blockchain
+
+    with pytest.raises(ValueError):
+        chain.add_transaction('no such address', user, 1)
+
+    with pytest.raises(ValueError):
+        chain._verify_transaction('no such address', 'from: x -- to: y -- amount: 1|abc')
+
+
+def test_admitted_signatures_survive_a_restart(chain_dir):
+    chain = Blockchain(bits=4, persist_signatures=True)
+    root = chain.initialize('root').address
+    user = chain.create_user('user').address
+    chain.add_transaction(root, user, 1)
+
+    restarted = Blockchain(bits=4, persist_signatures=True)
+    restarted.read_blockchain()
+    record = restarted._transaction_pool.records[-1]
+
+    assert restarted._verify_transaction(root, record)
+    assert restarted.signature_cache.hits == 1
+    assert restarted.signature_cache.misses == 0
+
+
+def test_key_depends_on_the_scheme():
+    args = (b'k' * 64, b'message', b'signature')
+
+    assert SignatureCache.key('ecdsa-secp256k1', *args) != SignatureCache.key('ecdsa-nist256p', *args)
+
+
+def test_least_recently_used_signature_is_dropped():
+    cache = SignatureCache(capacity=2)
+    cache.add(b'a')
+    cache.add(b'b')
+    assert cache.contains(b'a')
+
+    cache.add(b'c')
+
+    assert cache.contains(b'a') and cache.contains(b'c')
+    assert not cache.contains(b'b')
@@ -0,0 +1,184 @@
+# standard modules
+import os
+import hashlib
+# third-party modules
+import pytest
+# my modules
+from Block import Block
+from BlockStore import BlockStore
+from Journal import Journal
+from Storage import StorageWriter
+
+
+def make_blocks(count):
+    """A chain of mined blocks, each with one transaction"""
+    blocks = []
+    prev_height, prev_hash = -1, ''
+    for height in range(count):
+        block = Block(prev_height, 0, 1, 0, [f'transaction {height}'], prev_hash)
+        block.mine()
+        blocks.append(block)
+        prev_height, prev_hash = block.height, block.hash
+
+    return blocks
+
+
+class Crash(Exception):
+    """Raised where a test stops an operation"""
+
+
+def test_batch_writes_go_out_together(tmp_path):
+    path = str(tmp_path / 'file')
+    writer = StorageWriter()
+
+    with writer.batch():
+        writer.append(path, b'ab')
+        writer.append(path, b'cd')
+        writer.truncate(path, 3)
+        assert not os.path.exists(path)
+        assert writer.size(path) == 3
+        assert writer.read(path) == b'abc'
+
+    assert open(path, 'rb').read() == b'abc'
+
+
+def test_dropped_batch_leaves_the_files_and_runs_the_hooks_in_reverse(tmp_path):
+    path = str(tmp_path / 'file')
+    writer = StorageWriter()
+    writer.append(path, b'kept')
+    calls = []
+
+    with pytest.raises(Crash):
+        with writer.batch():
+            writer.append(path, b' dropped')
+            writer.on_abort(lambda: calls.append(1))
+            writer.on_abort(lambda: calls.append(2))
+            raise Crash()
+
+    assert open(path, 'rb').read() == b'kept'
+    assert calls == [2, 1]
+
+    # A flushed batch forgets its hooks
+    with writer.batch():
+        writer.on_abort(lambda: calls.append(3))
+    assert calls == [2, 1]
+
+
+def test_dropped_batch_puts_the_journal_cursors_back(tmp_path):
+    path = str(tmp_path / 'journal')
+    writer = StorageWriter()
+    journal = Journal(path, writer)
+    journal.append({'value': 0})
+
+    with pytest.raises(Crash):
+        with writer.batch():
+            journal.append({'value': 1})
+            journal.reset()
+            raise Crash()
+
+    assert (journal.seq, journal.size) == (1, 1)
+    assert journal.append({'value': 2}) == 2
+
+    replayed = Journal(path)
+    assert [entry['value'] for entry in replayed.replay()] == [0, 2]
+
+
+def test_dropped_batch_puts_the_block_store_back(tmp_path):
+    writer = StorageWriter()
+    store = BlockStore(str(tmp_path), segment_size=2, writer=writer)
+    blocks = make_blocks(4)
+    for block in blocks[:2]:
+        store.append(block)
+    assert store.get_height(blocks[1].hash) == 1
+
+    # The dropped block would have sealed the first segment
+    with pytest.raises(Crash):
+        with writer.batch():
+            store.append(blocks[2])
+            raise Crash()
+
+    assert store.size == 2
+    assert len(store.segments) == 1 and store.segments[0]['checksum'] is None
+    assert store.get_height(blocks[2].hash) is None
+
+    for block in blocks[2:]:
+        store.append(block)
+
+    reopened = BlockStore(str(tmp_path))
+    assert [block.hash for block in reopened.read_all(verify=True)] == [block.hash for block in blocks]
+
+
+def test_segments_roll_over_with_their_checksums(tmp_path):
+    store = BlockStore(str(tmp_path), segment_size=2)
+    blocks = make_blocks(5)
+    for block in blocks:
+        store.append(block)
+
+    segments = BlockStore(str(tmp_path)).segments
+    assert [(entry['start'], entry.get('end')) for entry in segments] == [(0, 1), (2, 3), (4, None)]
+
+    for entry in segments[:-1]:
+        with open(f'{tmp_path}/segment-{entry["id"]}', 'rb') as f:
+            assert entry['checksum'] == hashlib.sha256(f.read()).hexdigest()
+    assert segments[-1]['checksum'] is None
+
+    assert [store.read(height).hash for height in range(5)] == [block.hash for block in blocks]
+
+
+def test_recover_redoes_the_logged_batch(tmp_path, monkeypatch):
+    wal = str(tmp_path / 'wal')
+    first, second = str(tmp_path / 'first'), str(tmp_path / 'second')
+    writer = StorageWriter(wal_path=wal)
+    writer.append(first, b'0')
+
+    # Crash after the log is written and the first file is partially appended
+    def crash(records, redo=False):
+        with open(first, 'ab') as f:
+            f.write(b'1')
+        raise Crash()
+    monkeypatch.setattr(writer, '_apply', crash)
+
+    with pytest.raises(Crash):
+        with writer.batch():
+            writer.append(first, b'123')
+            writer.replace(second, b'new')
+
+    assert os.path.exists(wal)
+
+    recovered = StorageWriter(wal_path=wal)
+    assert recovered.recover()
+    assert open(first, 'rb').read() == b'0123'
+    assert open(second, 'rb').read() == b'new'
+    assert not os.path.exists(wal)
+
+    # The redo is done once
+    assert not recovered.recover()
+
+
+def test_recover_discards_a_torn_log(tmp_path):
+    wal = str(tmp_path / 'wal')
+    path = str(tmp_path / 'file')
+    with open(wal, 'wb') as f:
+        f.write(b'PBWAL1\x00')
+
+    writer = StorageWriter(wal_path=wal)
+    assert not writer.recover()
+    assert not os.path.exists(wal)
+    assert not os.path.exists(path)
+
+
+def test_interval_policy_syncs_the_last_writes_on_close(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced.append(fd))
+
+    writer = StorageWriter('interval', interval=3600)
+    writer.append(str(tmp_path / 'file'), b'data')
+    assert synced == []
+
+    writer.close()
+    assert synced
+
+    # Nothing is left to sync
+    synced.clear()
+    writer.close()
+    assert synced == []